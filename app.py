@@ -1,34 +1,148 @@
 
+import io
 import os
-import re
-import json
+import threading
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_file
-from processor import PDFOrderProcessor, slice_and_build_order_pdf
-from parsers import parse_order_page, normalize_ddmmyyyy
-from PyPDF2 import PdfReader, PdfWriter
+from flask import Flask, Response, request, jsonify, render_template, send_file, make_response, stream_with_context
+from processor import PDFOrderProcessor
+from config import RUNTIME
+from parsers import ParseStats, normalize_ddmmyyyy
+from pipeline import iter_parsed_chunks, render_orders_merged
 from db import (
     load_master_data,
     get_sku_info,
-    is_noscan_sku,
     get_print_counts_for_sku,
 )
+from store import open_store
+from scan_index import PendingIndex, line_needs_units
+from events import EventBus
+from jobs import JobRunner
+from uploads import save_content_addressed
+from barcodes import BarcodeError, decode, normalize_product_id
+from slicecache import SliceCache
+from printbatch import DEFAULT_DIR as BATCH_DIR, PrintBatcher
+from raster import FORMATS, KINDS, MIMETYPES, RasterCache, check_settings
+from spooler import PrintSpooler, make_sink
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
 STORE_DIR = os.path.join(os.path.dirname(__file__), "out")
-DB_PATH = os.path.join(STORE_DIR, "orders.json")
-os.makedirs(STORE_DIR, exist_ok=True)
-
-def _load_db():
-    if not os.path.exists(DB_PATH):
-        return {"orders": []}
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def _save_db(db):
-    with open(DB_PATH, "w", encoding="utf-8") as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+DB_PATH = os.path.join(STORE_DIR, "orders.json")          # legacy, imported once
+STORE_PATH = os.path.join(STORE_DIR, "orders.sqlite3")
+UPLOAD_DIR = os.path.join(STORE_DIR, "uploads")            # <sha256>.pdf per manifest
+
+# Opened by init_app() on the first request (however the app is served), not
+# at import: process-pool workers started with spawn re-import this module as
+# __mp_main__ and must not open the store, start batch/spool threads or
+# requeue print jobs. Workers never serve a request, so they never init.
+STORE = None
+
+# SKU -> pending line items still waiting for scans (see scan_index.py)
+PENDING = PendingIndex()
+
+# Push channel for /events (SSE); handlers publish after their transaction commits
+EVENTS = EventBus()
+
+# Background jobs; one at a time so uploads merge into the store in submission order
+JOBS = JobRunner(max_workers=1)
+_upload_jobs: dict[str, str] = {}   # sha256 -> job id while that file is being parsed
+
+# Pre-rendered label/invoice pieces (see slicecache.py); its own runner so it never delays parsing
+SLICES = SliceCache()
+PRERENDER = JobRunner(max_workers=1)
+
+# Order output for /scan/batch completions, rendered after the batch commits
+RENDERS = JobRunner(max_workers=1)
+MAX_SCAN_BATCH = 1000
+
+# output_mode="batch": completed orders go into a rolling print batch (see printbatch.py)
+# Orders wait as "batched" until their batch file is saved, then become "ready"
+def _batch_closed(info: dict):
+    changed = []
+    with STORE.transaction():
+        for order_id in info["order_ids"]:
+            o = STORE.get(order_id)
+            if o and o["status"] == "batched" and o["print_batch"]["batch_id"] == info["batch_id"]:
+                o["status"] = "ready"
+                changed.append((o, _save_order(o)))
+    for o, version in changed:
+        _publish_status(o, version)
+    EVENTS.publish("print_batch", {"batch_id": info["batch_id"], "order_ids": info["order_ids"],
+                                   "pages": info["pages"], "url": f"/batches/{info['batch_id']}"})
+    _spool(info["batch_id"], info["path"])
+
+# Print queue fed by /scan, /bulk_print and closed print batches (see spooler.py); set by init_app()
+SPOOLER = None
+
+def _spool(ref: str, path: str | None):
+    if SPOOLER is not None and path:
+        SPOOLER.enqueue(ref, path)
+
+# 1-bit label/invoice bitmaps for thermal printers, cached per order (see raster.py)
+RASTERS = RasterCache(SLICES)
+
+BATCHER = None
+
+_init_lock = threading.Lock()
+_initialized = False
+
+def init_app():
+    """Open the order store, create the print batcher / spooler and resume work
+    left over from the last run. Idempotent; runs in the serving process only
+    (see the note on STORE)."""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        _open_app_state()
+        _initialized = True
+        try:
+            _resume_pending_work()
+        except Exception as e:
+            print(f"[STARTUP ERROR] resuming left-over work: {e}")
+
+def _open_app_state():
+    global STORE, SPOOLER, BATCHER
+    os.makedirs(STORE_DIR, exist_ok=True)
+    STORE = open_store(STORE_PATH, backend="sqlite")
+    STORE.import_json(DB_PATH)
+    PENDING.build(STORE.by_status("pending"))
+
+    if RUNTIME.spool_sink != "off":
+        SPOOLER = PrintSpooler(
+            make_sink(RUNTIME.spool_sink,
+                      directory=os.path.join(os.path.dirname(__file__), RUNTIME.spool_dir),
+                      command=RUNTIME.spool_command),
+            path=os.path.join(STORE_DIR, "spool.sqlite3"),
+            max_attempts=RUNTIME.spool_max_attempts,
+            retry_base_s=RUNTIME.spool_retry_s,
+            on_change=lambda job: EVENTS.publish("print_job", job),
+        )
+    if RUNTIME.output_mode == "batch":
+        BATCHER = PrintBatcher(SLICES, max_orders=RUNTIME.batch_max_orders,
+                               max_age_s=RUNTIME.batch_max_age_s, on_close=_batch_closed)
+
+def _resume_pending_work():
+    if SPOOLER is not None:
+        SPOOLER.start()
+    # Orders whose completing scan was committed but never rendered, and
+    # orders whose print batch was lost before it was saved
+    _recover_batched()
+    unrendered = [o["order_id"] for o in STORE.by_status("rendering")]
+    if unrendered:
+        RENDERS.submit("render", lambda job: _run_render(job, unrendered))
+
+@app.before_request
+def _ensure_init():
+    init_app()
+
+def _save_order(o: dict) -> int:
+    """Persist one order and keep the pending-line index in step with it."""
+    version = STORE.put(o)
+    PENDING.track(o)
+    return version
 
 @app.route("/")
 def home():
@@ -36,104 +150,244 @@ def home():
 
 @app.route("/upload", methods=["POST"])
 def upload():
-    """1) User uploads PDF -> parse per page and store rows for the table."""
+    """
+    1) User uploads PDF -> queue a background job that parses it page by page.
+
+    Returns 202 with {job_id, job_url} right away; poll /jobs/<job_id> for
+    progress. Orders are stored chunk by chunk, so the first pages can be
+    scanned while the rest are still parsing. ?wait=1 blocks until the job
+    finishes and also returns the orders list (old synchronous behaviour).
+
+    Files are stored by content hash (out/uploads/<sha256>.pdf). Uploading a
+    file that was already parsed returns {duplicate: true} without parsing it
+    again; pass ?reparse=1 to force a fresh parse (e.g. after a parser fix).
+    """
     f = request.files.get("file")
     if not f:
         return jsonify({"ok": False, "error": "No file uploaded"}), 400
 
-    pdf_path = os.path.join(STORE_DIR, "uploaded.pdf")
-    f.save(pdf_path)
-
-    proc = PDFOrderProcessor(pdf_path)
-    pages = proc.doc_page_count()
-
-    db = _load_db()
+    sha, pdf_path = save_content_addressed(f.stream, UPLOAD_DIR)
+    reparse = request.args.get("reparse") == "1"
 
-    # Parse every page into an order "envelope"
-    orders_by_id = {o["order_id"]: o for o in db["orders"]}
+    previous = STORE.get_upload(sha)
+    if previous and not reparse:
+        return jsonify({"ok": True, "duplicate": True, "pdf_hash": sha, **previous})
 
-    for page_num in range(pages):
-        text = proc.page_text(page_num)
-        parsed = parse_order_page(text)
+    running = JOBS.get(_upload_jobs.get(sha, ""))
+    if running and running.status in ("queued", "running"):
+        job = running
+    else:
+        job = JOBS.submit("upload", lambda job: _run_upload(job, pdf_path, sha), on_done=_finish_upload)
+        _upload_jobs[sha] = job.id
 
-        if not parsed:
-            # not fatal; skip page
-            continue
+    if request.args.get("wait") == "1":
+        job.done.wait()
+        return jsonify({"ok": job.status == "done", "error": job.error,
+                        "job": job.to_dict(), "orders": STORE.all()})
 
-        order_id = parsed["order_id"]
-        # Build line items from SKUs discovered
-        items = []
-        for sku_item in parsed["items"]:
-            sku = sku_item["sku"]
-            qty = sku_item["qty"]
-            items.append({
-                "sku": sku,
-                "qty": qty,
-                # Collect product_ids via scanning; store list for qty>1
-                "product_ids": []
-            })
+    return jsonify({"ok": True, "job_id": job.id, "job_url": f"/jobs/{job.id}", "pdf_hash": sha}), 202
 
-        order_obj = {
-            "order_id": order_id,
-            "invoice_number": parsed.get("invoice_number"),
-            "customer_name": parsed.get("name"),
-            "date": normalize_ddmmyyyy(parsed.get("date")),
-            "page_index": page_num,
-            "pdf_path": pdf_path,
-            "status": "pending",
-            "items": items,
-        }
+def _run_upload(job, pdf_path: str, pdf_hash: str):
+    proc = PDFOrderProcessor(pdf_path)
+    job.pages_total = proc.doc_page_count()
+    proc.close()
+
+    # Parse every page into an order "envelope" (page ranges run in a process pool;
+    # chunks arrive in page order and are stored one transaction per chunk)
+    order_ids = {}
+    totals = ParseStats()
+    for chunk, stats in iter_parsed_chunks(pdf_path, job.pages_total, pdf_hash=pdf_hash):
+        chunk_ids = []
+        with STORE.transaction():
+            for page_num, parsed in chunk:
+                if not parsed:
+                    # not fatal; skip page
+                    continue
 
-        if order_id in orders_by_id:
-            # Deduplicate/merge (idempotent)
-            # Prefer latest parse for name/date/invoice_number
-            existing = orders_by_id[order_id]
-            existing.update({k: order_obj[k] for k in ["invoice_number", "customer_name", "date", "page_index", "pdf_path"]})
-            # Merge items by SKU and adjust qty if needed
-            by_sku = {it["sku"]: it for it in existing["items"]}
-            for it in items:
-                if it["sku"] in by_sku:
-                    by_sku[it["sku"]]["qty"] = max(by_sku[it["sku"]]["qty"], it["qty"])
-                else:
-                    existing["items"].append(it)
-        else:
-            db["orders"].append(order_obj)
+                chunk_ids.append(_store_parsed_page(parsed, page_num, pdf_path, pdf_hash)["order_id"])
+
+        totals.merge(stats)
+        job.pages_parsed = totals.pages
+        job.skipped_pages = totals.skipped_pages
+        order_ids.update(dict.fromkeys(chunk_ids))
+        job.orders_found = len(order_ids)
+        EVENTS.publish("orders_parsed", {"order_ids": chunk_ids, "job_id": job.id, "version": STORE.version()})
+        EVENTS.publish("job", job.to_dict())
+
+    job.result = {"order_ids": list(order_ids), "placeholder_items": totals.placeholder_items}
+    STORE.record_upload(pdf_hash, {
+        "pdf_path": pdf_path,
+        "pages_total": job.pages_total,
+        "orders_found": job.orders_found,
+        "skipped_pages": job.skipped_pages,
+        "placeholder_items": totals.placeholder_items,
+        "order_ids": job.result["order_ids"],
+    })
+
+def _finish_upload(job):
+    for sha, job_id in list(_upload_jobs.items()):
+        if job_id == job.id:
+            del _upload_jobs[sha]
+    if RUNTIME.prerender_slices and job.status == "done" and job.result.get("order_ids"):
+        order_ids = list(job.result["order_ids"])
+        pre = PRERENDER.submit("prerender", lambda pre: _run_prerender(pre, order_ids),
+                               on_done=lambda pre: EVENTS.publish("job", pre.to_dict()))
+        job.result["prerender_job_id"] = pre.id
+    EVENTS.publish("job", job.to_dict())
+
+def _run_prerender(job, order_ids: list[str]):
+    """Render slices for the still-pending orders of one upload (speculative; errors are skipped)."""
+    pages = {}
+    for order_id in order_ids:
+        o = STORE.get(order_id)
+        if o and o["status"] == "pending" and o.get("pdf_hash"):
+            pages[(o["pdf_hash"], o["page_index"])] = o["pdf_path"]
+
+    job.pages_total = len(pages)
+    rendered, failed = 0, []
+    for (pdf_hash, page_index), pdf_path in pages.items():
+        try:
+            rendered += SLICES.ensure(pdf_path, pdf_hash, page_index)
+        except Exception as e:
+            print(f"[PRERENDER ERROR] page {page_index}: {e}")
+            failed.append(page_index)
+        job.pages_parsed += 1
+    job.skipped_pages = failed
+    job.result = {"rendered": rendered, "cached": len(pages) - rendered - len(failed)}
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = JOBS.get(job_id) or PRERENDER.get(job_id) or RENDERS.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+    return jsonify({"ok": True, **job.to_dict()})
+
+def _store_parsed_page(parsed: dict, page_num: int, pdf_path: str, pdf_hash: str | None = None) -> dict:
+    """Turn one parsed page into an order envelope and upsert it into STORE."""
+    order_id = parsed["order_id"]
+    # Build line items from SKUs discovered
+    items = []
+    for sku_item in parsed["items"]:
+        sku = sku_item["sku"]
+        qty = sku_item["qty"]
+        items.append({
+            "sku": sku,
+            "qty": qty,
+            # Collect product_ids via scanning; store list for qty>1
+            "product_ids": []
+        })
 
-    _save_db(db)
-    return jsonify({"ok": True, "orders": db["orders"]})
+    order_obj = {
+        "order_id": order_id,
+        "invoice_number": parsed.get("invoice_number"),
+        "customer_name": parsed.get("name"),
+        "date": normalize_ddmmyyyy(parsed.get("date")),
+        "page_index": page_num,
+        "pdf_path": pdf_path,
+        "pdf_hash": pdf_hash,
+        "status": "pending",
+        "items": items,
+    }
+
+    existing = STORE.get(order_id)
+    if existing:
+        # Deduplicate/merge (idempotent)
+        # Prefer latest parse for name/date/invoice_number
+        existing.update({k: order_obj[k] for k in ["invoice_number", "customer_name", "date", "page_index", "pdf_path", "pdf_hash"]})
+        # Merge items by SKU and adjust qty if needed
+        by_sku = {it["sku"]: it for it in existing["items"]}
+        for it in items:
+            if it["sku"] in by_sku:
+                by_sku[it["sku"]]["qty"] = max(by_sku[it["sku"]]["qty"], it["qty"])
+            else:
+                existing["items"].append(it)
+        order_obj = existing
+
+    _save_order(order_obj)
+    return order_obj
+
+def _order_rows(o: dict, seq: int | None = None) -> list[dict]:
+    """Flatten one order into table rows (one per line item)."""
+    rows = []
+    for it in o["items"]:
+        info = get_sku_info(it["sku"])
+        rows.append({
+            "seq": seq,
+            "order_id": o["order_id"],
+            "invoice_number": o.get("invoice_number"),
+            "customer_name": o.get("customer_name"),
+            "sku": it["sku"],
+            "display_name": info.display_name,
+            "qty": it["qty"],
+            "product_ids": it["product_ids"],
+            "status": o["status"]
+        })
+    return rows
 
 @app.route("/orders", methods=["GET"])
 def list_orders():
-    load_master_data()
-    db = _load_db()
-    rows = []
-    for o in db["orders"]:
-        for it in o["items"]:
-            info = get_sku_info(it["sku"])
-            rows.append({
-                "order_id": o["order_id"],
-                "invoice_number": o.get("invoice_number"),
-                "customer_name": o.get("customer_name"),
-                "sku": it["sku"],
-                "display_name": info.display_name,
-                "qty": it["qty"],
-                "product_ids": it["product_ids"],
-                "status": o["status"]
-            })
-    return jsonify({"ok": True, "rows": rows})
+    """
+    Table rows for the UI. Query params (all optional):
+    - since=<version>  change feed: only orders written after that store version.
+                       "changed" lists every order_id in the batch so the client can
+                       drop its old rows; continue from "next_since" while "more".
+    - status=<status>  only orders with this status
+    - limit=<n>        page size
+    - after=<seq>      keyset cursor ("next_after" of the previous page)
+    - offset=<n>       plain offset paging (ignored with since)
+
+    "master" is the master-data generation; when it changes, cached rows are stale
+    (display names come from sku_master.csv) and should be re-read from since=0.
+
+    The ETag is the store version plus the master-data generation (rows carry
+    display names), so an unchanged table answers If-None-Match with an empty 304.
+    """
+    version = STORE.version()
+    master = load_master_data().generation
+    etag = f"v{version}-m{master}"
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+        resp.set_etag(etag)
+        return resp
+
+    since = request.args.get("since", type=int)
+    status = request.args.get("status") or None
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit <= 0:
+        limit = None
 
-SCAN_PATTERN = re.compile(r"^(AT\d{4})[-_:]?([A-Za-z0-9]{5})$", re.IGNORECASE)
-# sku, product_id = m.group(1).upper(), m.group(2).upper()
+    rows = []
+    body = {"ok": True, "rows": rows, "version": version, "master": master}
+
+    if since is not None:
+        changed = STORE.changed_since(since, limit=limit)
+        for seq, _, o in changed:
+            if status is None or o["status"] == status:
+                rows.extend(_order_rows(o, seq))
+        body["changed"] = [o["order_id"] for _, _, o in changed]
+        body["next_since"] = changed[-1][1] if changed else max(since, version)
+        body["more"] = limit is not None and len(changed) == limit
+    else:
+        page = STORE.page(
+            status=status,
+            limit=limit,
+            offset=request.args.get("offset", 0, type=int),
+            after_seq=request.args.get("after", type=int),
+        )
+        for seq, _, o in page:
+            rows.extend(_order_rows(o, seq))
+        body["next_after"] = page[-1][0] if page else None
+        body["more"] = limit is not None and len(page) == limit
+
+    resp = jsonify(body)
+    resp.set_etag(etag)
+    return resp
 
 def _is_order_complete(order_obj) -> bool:
     """Completion: all Compulsory/Loose items have full product_ids.
        Extras (NoScan SKUs) are ignored in this check."""
-    load_master_data()
     for it in order_obj.get("items", []):
-        sku = it["sku"].upper()
-        info = get_sku_info(sku)
-
-        if is_noscan_sku(sku):
+        if get_sku_info(it["sku"]).noscan:
             # Extras: never block completion
             continue
 
@@ -143,6 +397,226 @@ def _is_order_complete(order_obj) -> bool:
             return False
     return True
 
+def _recover_batched():
+    """Startup: a "batched" order whose batch file exists was printed (mark it
+    ready); otherwise its batch died with the last process, so render it again."""
+    with STORE.transaction():
+        for o in STORE.by_status("batched"):
+            batch_id = o["print_batch"]["batch_id"]
+            if os.path.exists(os.path.join(BATCH_DIR, f"{batch_id}.pdf")):
+                o["status"] = "ready"
+            else:
+                o["status"] = "rendering"
+                o.pop("print_batch", None)
+            _save_order(o)
+
+def _render_completed(o: dict, sku: str) -> bool:
+    """Produce the print output for a just-completed order and set its status.
+
+    per_order mode writes out/<order_id>.pdf and sets "ready"; batch mode appends
+    the pages to the rolling print batch, records where they landed and sets
+    "batched" (see _batch_closed)."""
+    labels, invoices = get_print_counts_for_sku(sku)
+    try:
+        if BATCHER is not None:
+            placed = BATCHER.add(o["order_id"], o["pdf_path"], o.get("pdf_hash"),
+                                 o["page_index"], labels=labels, invoices=invoices)
+            o["print_batch"] = {**placed, "labels": labels, "invoices": invoices}
+            o["status"] = "batched"
+            return True
+        else:
+            out_pdf = os.path.join(STORE_DIR, f"{o['order_id']}.pdf")
+            SLICES.build_order_pdf(
+                source_pdf=o["pdf_path"],
+                pdf_hash=o.get("pdf_hash"),
+                page_index=o["page_index"],
+                out_pdf=out_pdf,
+                labels=labels,
+                invoices=invoices,
+            )
+            o["out_pdf"] = out_pdf
+        o["status"] = "ready"
+        return True
+    except Exception as e:
+        o["status"] = "error"
+        o["error"] = str(e)
+        return False
+
+def _publish_status(o: dict, version: int):
+    EVENTS.publish("order_status", {
+        "order_id": o["order_id"],
+        "status": o["status"],
+        "error": o.get("error"),
+        "version": version,
+    })
+
+@app.route("/events", methods=["GET"])
+def events():
+    """
+    Server-Sent Events stream for packing screens:
+    - orders_parsed: {order_ids, job_id, version} per parsed chunk of an upload
+    - job:           /jobs/<id> payload whenever an upload (or prerender) job makes progress
+    - scan:          {ok, code, sku, order_id, completed_order, version}
+    - scan_batch:    {count, ok, order_ids, completed_orders, version} per /scan/batch
+    - order_status:  {order_id, status, error, version} when an order leaves pending
+    - print_batch:   {batch_id, order_ids, pages, url} when a print batch is closed
+    - print_job:     print queue job {id, ref, path, status, attempts, error, ...} on every change
+    - resync:        the screen fell behind; re-read /orders?since=<version>
+    """
+    q = EVENTS.subscribe()
+    return Response(
+        stream_with_context(EVENTS.stream(q)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _apply_scan(code_raw: str) -> tuple[dict, dict | None]:
+    """Apply one scan; call inside STORE.transaction().
+
+    Returns (result, changed order or None). An order the scan completes is
+    left in status "rendering" with its print SKU recorded; the caller renders
+    it after the commit (_render_after_commit), so PDF work never holds the
+    store's write lock."""
+    try:
+        sku, product_id, kind = decode(code_raw)
+    except BarcodeError as e:
+        return {"ok": False, "code": code_raw, "error": str(e)}, None
+
+    info = get_sku_info(sku)
+    if kind == "sku" and info.type == "Compulsory":
+        return {"ok": False, "code": code_raw, "sku": sku,
+                "error": f"SKU {sku} is Compulsory — scan with product id (e.g. {sku}-A0001)"}, None
+    # Loose + bare SKU: we'll create an internal token below
+
+    if product_id is not None:
+        # One physical unit, one order: reject a unit already scanned anywhere
+        owner = STORE.unit_owner(sku, product_id)
+        if owner is not None:
+            return {"ok": False, "code": code_raw, "sku": sku, "order_id": owner,
+                    "error": f"{sku}-{product_id} was already scanned into order {owner}"}, None
+
+    updated = False
+    changed_order = None
+
+    # Extras/NoScan: ignore scans
+    candidates = () if info.noscan else PENDING.candidates(sku)
+
+    for order_id in candidates:
+        o = STORE.get(order_id)
+        if o is None:
+            PENDING.forget(order_id, [sku])
+            continue
+
+        for it in o["items"]:
+            if it["sku"].upper() != sku:
+                continue
+
+            # Ensure product_ids list exists
+            if "product_ids" not in it or it["product_ids"] is None:
+                it["product_ids"] = []
+
+            # If already full (or order no longer pending), skip
+            if not line_needs_units(o, it):
+                continue
+
+            if info.type == "Loose" and product_id is None:
+                # Loose + bare SKU → auto-generate token
+                token_idx = len(it["product_ids"]) + 1
+                token = f"SCAN-{sku}-{token_idx:04d}"
+                it["product_ids"].append(token)
+                updated = True
+            else:
+                # Compulsory or explicit product-id
+                if product_id not in it["product_ids"]:
+                    it["product_ids"].append(product_id)
+                    updated = True
+
+            if updated:
+                break  # stop scanning items for this order
+
+        if updated:
+            if _is_order_complete(o):
+                o["status"] = "rendering"
+                o["print_sku"] = sku
+            _save_order(o)
+            changed_order = o
+            break  # we handled this scan
+
+        # Nothing to do on this order (stale entry): resync and move on
+        PENDING.track(o)
+
+    if not updated:
+        print(f"[SCAN WARN] SKU {sku} not found or already complete.")
+
+    return {
+        "ok": updated,
+        "code": code_raw,
+        "sku": sku,
+        "order_id": changed_order["order_id"] if changed_order else None,
+        "completed": bool(changed_order) and changed_order["status"] == "rendering",
+    }, changed_order
+
+# Fields _render_completed() sets; the only ones copied back after rendering
+_RENDER_FIELDS = ("status", "out_pdf", "print_batch", "error")
+_RENDER_ATTEMPTS = 3
+
+def _render_source(o: dict) -> tuple:
+    return (o["pdf_path"], o.get("pdf_hash"), o["page_index"], o.get("print_sku"))
+
+def _render_one(order_id: str) -> tuple[dict, int] | None:
+    """Render one "rendering" order and store the outcome. The render runs outside
+    any transaction, so the order is re-read before writing: only the render fields
+    are copied onto the current row, and if its source changed meanwhile (an upload
+    merge of the same order_id) it is rendered again. None if nothing was saved."""
+    for _ in range(_RENDER_ATTEMPTS):
+        o = STORE.get(order_id)
+        if o is None or o["status"] != "rendering":
+            return None
+        _render_completed(o, o.get("print_sku") or o["items"][0]["sku"])
+        with STORE.transaction():
+            current = STORE.get(order_id)
+            if current is None or current["status"] != "rendering":
+                return None   # finished elsewhere (e.g. /bulk_print); our output no longer applies
+            if _render_source(current) != _render_source(o):
+                continue
+            for field in _RENDER_FIELDS:
+                if field in o:
+                    current[field] = o[field]
+                else:
+                    current.pop(field, None)
+            # The batch may have been saved (and _batch_closed run) before this commit
+            if current["status"] == "batched" and BATCHER.is_saved(current["print_batch"]["batch_id"]):
+                current["status"] = "ready"
+            return current, _save_order(current)
+    print(f"[RENDER WARN] {order_id} kept changing while rendering; left in 'rendering'")
+    return None
+
+def _render_after_commit(order_ids: list[str], job=None) -> list[dict]:
+    """Render orders a committed scan left in "rendering" and store ready/error.
+    Each order is saved (and announced) as soon as its output exists."""
+    done = []
+    for order_id in order_ids:
+        saved = _render_one(order_id)
+        if saved is None:
+            continue
+        o, version = saved
+        _publish_status(o, version)
+        if o["status"] == "ready":
+            _spool(o["order_id"], o.get("out_pdf"))
+        done.append(o)
+        if job is not None:
+            job.pages_parsed += 1
+    return done
+
+def _run_render(job, order_ids: list[str]):
+    job.pages_total = len(order_ids)
+    done = _render_after_commit(order_ids, job)
+    job.result = {
+        "ready": [o["order_id"] for o in done if o["status"] == "ready"],
+        "batched": [o["order_id"] for o in done if o["status"] == "batched"],
+        "error": {o["order_id"]: o.get("error") for o in done if o["status"] == "error"},
+    }
+
 @app.route("/scan", methods=["POST"])
 def scan():
     """
@@ -150,6 +624,10 @@ def scan():
     - Loose: 'AT0001' is valid (one scan = +1 unit)
     - Compulsory: 'AT0001-A0001' (or A001) required; normalized to A0001
     - NoScan (extras): never need scanning; ignored in completion check
+
+    Responds with only the order the scan changed plus the store version.
+    Send {"include_orders": true} (or ?include_orders=1) to also get the
+    full "orders" list like older clients expect.
     """
     try:
         load_master_data()
@@ -159,106 +637,105 @@ def scan():
         if not code_raw:
             return jsonify({"ok": False, "error": "No barcode provided"}), 400
 
-        # Try pure-SKU first (for Loose SKUs)
-        sku_only_match = re.match(r"^(AT\d{4})$", code_raw, re.IGNORECASE)
-
-        sku = None
-        product_id = None
-
-        if sku_only_match:
-            sku = sku_only_match.group(1).upper()
-            info = get_sku_info(sku)
-            if info.type == "Compulsory":
-                return jsonify({
-                    "ok": False,
-                    "error": f"SKU {sku} is Compulsory — scan with product id (e.g. {sku}-A0001)"
-                }), 400
-            # Loose: we'll create an internal token below
-        else:
-            # Compulsory (or explicit loose) with product-id
-            m = re.match(r"^(AT\d{4})[-_:]?([A-Z])(\d{1,4})$", code_raw, re.IGNORECASE)
-            if not m:
-                return jsonify({
-                    "ok": False,
-                    "error": "Invalid code format. Expected AT0001 or AT0001-A001 / AT0001-A0001"
-                }), 400
-
-            sku, letter, digits = m.groups()
-            sku = sku.upper()
-            product_id = f"{letter}{int(digits):04d}"
-
-        info = get_sku_info(sku)
-
-        db = _load_db()
-        updated = False
-        completed_order_id = None
-
-        for o in db["orders"]:
-            if o["status"] != "pending":
-                continue
-
-            for it in o["items"]:
-                if it["sku"].upper() != sku:
-                    continue
+        with STORE.transaction():
+            result, changed_order = _apply_scan(code_raw)
+        if result.get("error"):
+            return jsonify({"ok": False, "error": result["error"]}), 400
+
+        version = STORE.version()
+        EVENTS.publish("scan", {
+            "ok": result["ok"],
+            "code": code_raw,
+            "sku": result["sku"],
+            "order_id": result["order_id"],
+            "completed_order": result["order_id"] if result["completed"] else None,
+            "version": version,
+        })
 
-                # Extras/NoScan: ignore scans
-                if is_noscan_sku(sku):
-                    continue
+        completed_order_id = None
+        if result["completed"]:
+            # Committed above; render now, outside the write transaction
+            rendered = _render_after_commit([changed_order["order_id"]])
+            if rendered:
+                changed_order = rendered[0]
+                if changed_order["status"] in ("ready", "batched"):
+                    completed_order_id = changed_order["order_id"]
+            version = STORE.version()
+
+        resp = {
+            "ok": result["ok"],
+            "completed_order": completed_order_id,
+            "order": changed_order,
+            "version": version,
+        }
+        if payload.get("include_orders") or request.args.get("include_orders") == "1":
+            resp["orders"] = STORE.all()
+        return jsonify(resp)
 
-                qty = int(it["qty"])
+    except Exception as e:
+        print(f"[SCAN FATAL ERROR] {e}")
+        return jsonify({"ok": False, "error": f"Unexpected error: {e}"}), 500
 
-                # Ensure product_ids list exists
-                if "product_ids" not in it or it["product_ids"] is None:
-                    it["product_ids"] = []
+@app.route("/scan/batch", methods=["POST"])
+def scan_batch():
+    """
+    Apply a list of buffered scans ({"codes": [...]}) in order, in one transaction.
 
-                # If already full, skip
-                if len(it["product_ids"]) >= qty:
+    Responds with one result per code ({ok, code, sku, order_id, completed} or
+    {ok: false, code, error}), the orders the batch completed and their current
+    state. Completed orders are rendered after the commit by a background job
+    ("render_job_id", see /jobs/<id>; order_status events follow); pass ?wait=1
+    to return only once they are rendered.
+    """
+    try:
+        load_master_data()
+        payload = request.get_json(force=True)
+        codes = payload.get("codes")
+        if not isinstance(codes, list) or not codes:
+            return jsonify({"ok": False, "error": "codes must be a non-empty list"}), 400
+        if len(codes) > MAX_SCAN_BATCH:
+            return jsonify({"ok": False, "error": f"At most {MAX_SCAN_BATCH} codes per batch"}), 400
+
+        results = []
+        changed: dict[str, dict] = {}
+        with STORE.transaction():
+            for code in codes:
+                code_raw = str(code or "").strip().upper()
+                if not code_raw:
+                    results.append({"ok": False, "code": code_raw, "error": "No barcode provided"})
                     continue
-
-                if info.type == "Loose" and product_id is None:
-                    # Loose + bare SKU → auto-generate token
-                    token_idx = len(it["product_ids"]) + 1
-                    token = f"SCAN-{sku}-{token_idx:04d}"
-                    it["product_ids"].append(token)
-                    updated = True
-                else:
-                    # Compulsory or explicit product-id
-                    if product_id not in it["product_ids"]:
-                        it["product_ids"].append(product_id)
-                        updated = True
-
-                if updated:
-                    break  # stop scanning items for this order
-
-            if updated:
-                if _is_order_complete(o):
-                    labels, invoices = get_print_counts_for_sku(sku)
-                    out_pdf = os.path.join(STORE_DIR, f"{o['order_id']}.pdf")
-                    try:
-                        slice_and_build_order_pdf(
-                            source_pdf=o["pdf_path"],
-                            page_index=o["page_index"],
-                            out_pdf=out_pdf,
-                            labels=labels,
-                            invoices=invoices,
-                        )
-                        o["status"] = "ready"
-                        o["out_pdf"] = out_pdf
-                        completed_order_id = o["order_id"]
-                    except Exception as e:
-                        o["status"] = "error"
-                        o["error"] = str(e)
-                break  # we handled this scan
-
-        if updated:
-            _save_db(db)
-        else:
-            print(f"[SCAN WARN] SKU {sku} not found or already complete.")
-
-        return jsonify({"ok": updated, "completed_order": completed_order_id, "orders": db["orders"]})
+                result, changed_order = _apply_scan(code_raw)
+                results.append(result)
+                if changed_order is not None:
+                    changed[changed_order["order_id"]] = changed_order
+
+        version = STORE.version()
+        completed = [o["order_id"] for o in changed.values() if o["status"] == "rendering"]
+        EVENTS.publish("scan_batch", {
+            "count": len(results),
+            "ok": sum(r["ok"] for r in results),
+            "order_ids": list(changed),
+            "completed_orders": completed,
+            "version": version,
+        })
+        for order_id in completed:
+            _publish_status(changed[order_id], version)
+
+        resp = {"ok": True, "results": results, "completed_orders": completed, "version": version}
+        if completed:
+            job = RENDERS.submit("render", lambda job: _run_render(job, completed),
+                                 on_done=lambda job: EVENTS.publish("job", job.to_dict()))
+            resp["render_job_id"] = job.id
+            if request.args.get("wait") == "1":
+                job.done.wait()
+                resp["version"] = STORE.version()
+                for order_id in completed:
+                    changed[order_id] = STORE.get(order_id) or changed[order_id]
+        resp["orders"] = list(changed.values())
+        return jsonify(resp)
 
     except Exception as e:
-        print(f"[SCAN FATAL ERROR] {e}")
+        print(f"[SCAN BATCH FATAL ERROR] {e}")
         return jsonify({"ok": False, "error": f"Unexpected error: {e}"}), 500
 
 @app.route("/bulk_print", methods=["POST"])
@@ -268,8 +745,10 @@ def bulk_print():
     - Treat selected SKU as Loose, regardless of master type
     - Auto-assign product_ids: BULK-{sku}-{0001..}
     - Only considers orders that contain exactly one SKU (single-SKU orders)
-    - Marks those orders as 'ready' and generates PDFs
-    - Merges them into one bulk PDF and returns download URL
+    - Renders the orders in parallel (pipeline.render_orders_merged) straight into
+      one bulk PDF, plus each order's own PDF for /download
+    - Marks rendered orders 'ready' and the rest 'error'; failures are listed in
+      "failed" instead of aborting the batch
     """
     try:
         load_master_data()
@@ -279,79 +758,85 @@ def bulk_print():
         if not sku:
             return jsonify({"ok": False, "error": "SKU is required"}), 400
 
-        db = _load_db()
-
-        pdf_paths: list[str] = []
-        bulk_count = 0
-
-        for o in db["orders"]:
+        labels, invoices = get_print_counts_for_sku(sku)
+        specs = []
+        for o in STORE.with_sku(sku):
             items = o.get("items", [])
-            if len(items) != 1:
+            if len(items) != 1 or items[0]["sku"].upper() != sku:
                 continue  # bulk-print is only for single-SKU orders
+            specs.append({
+                "order_id": o["order_id"],
+                "source_pdf": o["pdf_path"],
+                "pdf_hash": o.get("pdf_hash"),
+                "page_index": o["page_index"],
+                "out_pdf": os.path.join(STORE_DIR, f"{o['order_id']}.pdf"),
+                "labels": labels,
+                "invoices": invoices,
+            })
 
-            it = items[0]
-            if it["sku"].upper() != sku:
-                continue
+        if not specs:
+            return jsonify({
+                "ok": False,
+                "error": f"No single-SKU orders found for {sku}"
+            }), 404
 
-            qty = int(it["qty"])
-            if "product_ids" not in it or it["product_ids"] is None:
-                it["product_ids"] = []
+        # Render outside the transaction: scans keep going while workers run
+        bulk_pdf_path = os.path.join(STORE_DIR, f"bulk_{sku}.pdf")
+        results = render_orders_merged(specs, bulk_pdf_path)
+
+        touched = []
+        failed = []
+        with STORE.transaction():
+            for r in results:
+                o = STORE.get(r["order_id"])
+                if o is None:
+                    continue
+                it = o["items"][0]
+                qty = int(it["qty"])
+                if "product_ids" not in it or it["product_ids"] is None:
+                    it["product_ids"] = []
 
-            # Treat as Loose irrespective of master type
-            # Fill product_ids up to qty using BULK tokens
-            while len(it["product_ids"]) < qty:
-                token_idx = len(it["product_ids"]) + 1
-                token = f"BULK-{sku}-{token_idx:04d}"
-                if token not in it["product_ids"]:
-                    it["product_ids"].append(token)
+                # Treat as Loose irrespective of master type
+                # Fill product_ids up to qty using BULK tokens
+                while len(it["product_ids"]) < qty:
+                    token_idx = len(it["product_ids"]) + 1
+                    token = f"BULK-{sku}-{token_idx:04d}"
+                    if token not in it["product_ids"]:
+                        it["product_ids"].append(token)
+
+                if r["ok"]:
+                    o["status"] = "ready"
+                    o["out_pdf"] = r["out_pdf"]
+                    o.pop("error", None)
+                else:
+                    o["status"] = "error"
+                    o["error"] = r["error"]
+                    failed.append({"order_id": o["order_id"], "error": r["error"]})
+                    print(f"[BULK RENDER ERROR] {o['order_id']}: {r['error']}")
 
-            # Now treat as complete and generate per-order PDF
-            labels, invoices = get_print_counts_for_sku(sku)
-            out_pdf = os.path.join(STORE_DIR, f"{o['order_id']}.pdf")
+                _save_order(o)
+                touched.append(o)
 
-            try:
-                slice_and_build_order_pdf(
-                    source_pdf=o["pdf_path"],
-                    page_index=o["page_index"],
-                    out_pdf=out_pdf,
-                    labels=labels,
-                    invoices=invoices,
-                )
-                o["status"] = "ready"
-                o["out_pdf"] = out_pdf
-                pdf_paths.append(out_pdf)
-                bulk_count += 1
-            except Exception as e:
-                o["status"] = "error"
-                o["error"] = str(e)
+        version = STORE.version()
+        for o in touched:
+            _publish_status(o, version)
 
+        bulk_count = len(touched) - len(failed)
         if bulk_count == 0:
-            _save_db(db)
             return jsonify({
                 "ok": False,
-                "error": f"No single-SKU orders found for {sku}"
-            }), 404
-
-        # Merge all PDFs into one
-        bulk_pdf_path = os.path.join(STORE_DIR, f"bulk_{sku}.pdf")
-        writer = PdfWriter()
-        for path in pdf_paths:
-            try:
-                reader = PdfReader(path)
-                for p in reader.pages:
-                    writer.add_page(p)
-            except Exception as e:
-                print(f"[BULK MERGE ERROR] {path}: {e}")
-
-        with open(bulk_pdf_path, "wb") as f:
-            writer.write(f)
+                "sku": sku,
+                "error": f"No orders could be rendered for {sku}",
+                "failed": failed,
+            }), 500
 
-        _save_db(db)
+        _spool(f"bulk_{sku}", bulk_pdf_path)
 
         return jsonify({
             "ok": True,
             "sku": sku,
             "count": bulk_count,
+            "failed": failed,
             "bulk_pdf_url": f"/bulk_download/{sku}"
         })
 
@@ -375,7 +860,8 @@ def clear_all():
     and clears frontend view.
     """
     try:
-        keep_files = {"orders.json"}  # you can also add "uploaded.pdf" here if needed
+        # Source manifests live in out/uploads/ and are left alone: pending orders still need them
+        keep_files = {"orders.json"}
 
         for fname in os.listdir(STORE_DIR):
             if fname.lower().endswith(".pdf") and fname not in keep_files:
@@ -383,7 +869,7 @@ def clear_all():
 
         # Optionally also clear rows from DB:
         # Uncomment if you want full reset:
-        # _save_db({"orders": []})
+        # STORE.clear()
 
         return jsonify({"ok": True})
     except Exception as e:
@@ -391,11 +877,122 @@ def clear_all():
 
 @app.route("/download/<order_id>", methods=["GET"])
 def download(order_id):
-    db = _load_db()
-    for o in db["orders"]:
-        if o["order_id"] == order_id and o.get("out_pdf") and os.path.exists(o["out_pdf"]):
-            return send_file(o["out_pdf"], as_attachment=True)
+    o = STORE.get(order_id)
+    if o and o.get("out_pdf") and os.path.exists(o["out_pdf"]):
+        return send_file(o["out_pdf"], as_attachment=True)
+    if o and o.get("print_batch") and o["status"] in ("ready", "batched"):
+        # Printed as part of a batch: rebuild just this order in memory
+        placed = o["print_batch"]
+        data = SLICES.order_pdf_bytes(o["pdf_path"], o.get("pdf_hash"), o["page_index"],
+                                      labels=placed["labels"], invoices=placed["invoices"])
+        return send_file(io.BytesIO(data), mimetype="application/pdf", as_attachment=True,
+                         download_name=f"{order_id}.pdf")
     return jsonify({"ok": False, "error": "Not found or not ready yet"}), 404
 
+@app.route("/raster/<order_id>/<kind>.<fmt>", methods=["GET"])
+def raster(order_id, kind, fmt):
+    """
+    Thermal-printer bitmap of an order's label or invoice page:
+    kind = label | invoice, fmt = png | pbm | zpl. Optional ?dpi= (72-600) and
+    ?threshold= (0-255) override RuntimeConfig.raster_dpi / raster_threshold.
+    """
+    if kind not in KINDS or fmt not in FORMATS:
+        return jsonify({"ok": False, "error": f"Expected /raster/<order_id>/<{'|'.join(KINDS)}>.<{'|'.join(FORMATS)}>"}), 400
+    dpi = request.args.get("dpi", RUNTIME.raster_dpi, type=int)
+    threshold = request.args.get("threshold", RUNTIME.raster_threshold, type=int)
+    try:
+        check_settings(dpi, threshold)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    o = STORE.get(order_id)
+    if o is None:
+        return jsonify({"ok": False, "error": "Not found"}), 404
+    try:
+        path = RASTERS.get(o, kind, fmt, dpi=dpi, threshold=threshold)
+    except Exception as e:
+        print(f"[RASTER ERROR] {order_id}: {e}")
+        return jsonify({"ok": False, "error": str(e)}), 500
+    return send_file(path, mimetype=MIMETYPES[fmt], as_attachment=True, download_name=f"{order_id}-{kind}.{fmt}")
+
+@app.route("/units/<code>", methods=["GET"])
+def unit_lookup(code):
+    """
+    Where did a unit go: AT0001-A0001 gives the order it was scanned into;
+    a bare product id (A0001) lists every SKU's unit with that id.
+    """
+    try:
+        sku, product_id, kind = decode(code)
+    except BarcodeError:
+        try:
+            sku, product_id, kind = None, normalize_product_id(code), "unit"
+        except BarcodeError:
+            kind = None
+    if kind != "unit":
+        return jsonify({"ok": False, "error": "Expected a unit code (AT0001-A0001) or a product id (A0001)"}), 400
+    units = []
+    for unit_sku, unit_pid, order_id in STORE.find_units(product_id, sku):
+        o = STORE.get(order_id) or {}
+        units.append({
+            "sku": unit_sku,
+            "product_id": unit_pid,
+            "order_id": order_id,
+            "status": o.get("status"),
+            "invoice_number": o.get("invoice_number"),
+            "customer_name": o.get("customer_name"),
+        })
+    if not units:
+        return jsonify({"ok": False, "error": f"{code} has not been scanned into any order"}), 404
+    return jsonify({"ok": True, "units": units})
+
+@app.route("/print_queue", methods=["GET"])
+def print_queue():
+    """Queue depth by status plus the latest jobs (?status=queued|printing|done|failed, ?limit=)."""
+    if SPOOLER is None:
+        return jsonify({"ok": False, "error": "Print queue is off (RuntimeConfig.spool_sink)"}), 404
+    return jsonify({
+        "ok": True,
+        "depth": SPOOLER.depth(),
+        "jobs": SPOOLER.jobs(status=request.args.get("status") or None,
+                             limit=request.args.get("limit", 50, type=int)),
+    })
+
+@app.route("/print_queue/<int:job_id>/retry", methods=["POST"])
+def retry_print_job(job_id):
+    if SPOOLER is None:
+        return jsonify({"ok": False, "error": "Print queue is off (RuntimeConfig.spool_sink)"}), 404
+    if not SPOOLER.retry(job_id):
+        return jsonify({"ok": False, "error": "No failed job with that id"}), 404
+    return jsonify({"ok": True})
+
+@app.route("/batches", methods=["GET"])
+def batches():
+    """Print batches (output_mode="batch"): the open one and the closed files."""
+    if BATCHER is None:
+        return jsonify({"ok": False, "error": "Batch output is off (RuntimeConfig.output_mode)"}), 404
+    return jsonify({"ok": True, "current": BATCHER.current(), "closed": BATCHER.list_closed()})
+
+@app.route("/batches/rotate", methods=["POST"])
+def rotate_batch():
+    """Close the open print batch now (e.g. end of shift) instead of waiting for count/age."""
+    if BATCHER is None:
+        return jsonify({"ok": False, "error": "Batch output is off (RuntimeConfig.output_mode)"}), 404
+    try:
+        closed = BATCHER.rotate()
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"Batch not saved (will retry): {e}"}), 500
+    return jsonify({"ok": True, "closed": closed["batch_id"] if closed else None})
+
+@app.route("/batches/<batch_id>", methods=["GET"])
+def batch_download(batch_id):
+    if BATCHER is not None and batch_id in BATCHER.list_closed():
+        return send_file(BATCHER.path(batch_id), as_attachment=True)
+    return jsonify({"ok": False, "error": "Batch not found"}), 404
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    # Start now rather than on the first request, so the print queue and
+    # unfinished renders resume right away; skipped in the debug reloader's
+    # watcher process, which serves nothing
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_app()
+    # threaded: each /events subscriber holds a worker thread
+    app.run(host="0.0.0.0", port=8000, debug=True, threaded=True)
@@ -0,0 +1,79 @@
+# benchmarks/bench_barcodes.py
+# -----------------------------------------------
+# Decodes/sec: barcodes.decode() vs. the inline re.match() calls /scan
+# used before (pattern strings looked up in re's cache on every call).
+#
+#   python benchmarks/bench_barcodes.py [--codes 100000] [--repeat 5]
+#
+# Also checks both return the same (sku, product_id) for every code.
+# -----------------------------------------------
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from barcodes import BarcodeError, decode  # noqa: E402
+
+
+def legacy_decode(code: str):
+    code_raw = (code or "").strip().upper()
+    if re.match(r"^(AT\d{4})$", code_raw, re.IGNORECASE):
+        return code_raw, None
+    m = re.match(r"^(AT\d{4})[-_:]?([A-Z])(\d{1,4})$", code_raw, re.IGNORECASE)
+    if not m:
+        return None
+    sku, letter, digits = m.groups()
+    return sku.upper(), f"{letter}{int(digits):04d}"
+
+
+def new_decode(code: str):
+    try:
+        sku, product_id, _ = decode(code)
+    except BarcodeError:
+        return None
+    return sku, product_id
+
+
+def sample_codes(rng: random.Random, n: int) -> list[str]:
+    codes = []
+    for _ in range(n):
+        sku = f"AT{rng.randint(1, 300):04d}"
+        r = rng.random()
+        if r < 0.3:
+            codes.append(sku)
+        elif r < 0.95:
+            sep = rng.choice(("-", "_", ":", ""))
+            letter = rng.choice("ABCDEFGH")
+            digits = rng.choice((f"{rng.randint(0, 999):03d}", f"{rng.randint(0, 9999):04d}"))
+            codes.append(f"{sku}{sep}{letter}{digits}".lower() if rng.random() < 0.1 else f"{sku}{sep}{letter}{digits}")
+        else:
+            codes.append(rng.choice(("", "HELLO", "AT12", f"{sku}-A00001", f" {sku} ")))
+    return codes
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scan-code decode micro-benchmark")
+    ap.add_argument("--codes", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    codes = sample_codes(random.Random(42), args.codes)
+    mismatches = [c for c in codes if legacy_decode(c) != new_decode(c)]
+
+    for label, fn in (("inline re.match", legacy_decode), ("barcodes.decode", new_decode)):
+        best = min(timeit.repeat(lambda: [fn(c) for c in codes], number=1, repeat=args.repeat))
+        print(f"{label:>16}: {len(codes) / best:10.0f} decodes/s  ({best / len(codes) * 1e6:5.2f} us/code)")
+
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} code(s), first: {mismatches[:10]}")
+        sys.exit(1)
+    print(f"results identical on all {len(codes)} code(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_extract.py
+# -----------------------------------------------
+# Full-page vs. region-clipped text extraction on a real manifest.
+#
+#   python benchmarks/bench_extract.py path/to/manifest.pdf [--pages 200] [--repeat 3]
+#
+# Reports pages/sec and characters per page for both modes, then checks
+# that parse_order_page() returns the same result for every page. Any
+# mismatch means the SplitConfig text band cuts off a field: widen them
+# before switching RuntimeConfig.text_mode to "clipped".
+# -----------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docpool import POOL  # noqa: E402
+from parsers import parse_order_page  # noqa: E402
+from processor import PDFOrderProcessor  # noqa: E402
+
+
+def _time_mode(pdf_path: str, mode: str, pages: int, repeat: int):
+    proc = PDFOrderProcessor(pdf_path, text_mode=mode)
+    best, texts = None, []
+    with POOL.document(pdf_path) as doc:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            texts = [proc._extract_text(doc, i) for i in range(pages)]
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+    return best, texts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Full vs. clipped page-text extraction")
+    ap.add_argument("pdf")
+    ap.add_argument("--pages", type=int, default=0, help="limit to the first N pages (0 = all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    proc = PDFOrderProcessor(args.pdf)
+    pages = proc.doc_page_count()
+    proc.close()
+    if args.pages:
+        pages = min(pages, args.pages)
+
+    results = {}
+    for mode in ("full", "clipped"):
+        elapsed, texts = _time_mode(args.pdf, mode, pages, args.repeat)
+        chars = sum(len(t) for t in texts) / max(1, pages)
+        t0 = time.perf_counter()
+        parsed = [parse_order_page(t) for t in texts]
+        parse_s = time.perf_counter() - t0
+        results[mode] = parsed
+        print(f"{mode:>8}: extract {pages / elapsed:8.1f} pages/s | "
+              f"parse {pages / parse_s:9.1f} pages/s | {chars:7.0f} chars/page")
+
+    mismatches = [i for i, (a, b) in enumerate(zip(results["full"], results["clipped"])) if a != b]
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} page(s), first: {mismatches[:10]}")
+        sys.exit(1)
+    print(f"parse results identical on all {pages} page(s)")
+
+
+if __name__ == "__main__":
+    main()
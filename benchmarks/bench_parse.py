@@ -0,0 +1,84 @@
+# benchmarks/bench_parse.py
+# -----------------------------------------------
+# Per-page parse time: parse_order_page() (keyword-anchored) vs. the
+# previous one-full-search-per-field implementation.
+#
+#   python benchmarks/bench_parse.py                      # synthetic Flipkart-style pages
+#   python benchmarks/bench_parse.py manifest.pdf         # real page text (needs PyMuPDF)
+#
+# Also verifies both parsers return identical results on every page.
+# -----------------------------------------------
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import _parse_order_page_multipass, parse_order_page  # noqa: E402
+
+_FILLER = (
+    "Sold By: Example Retail Pvt Ltd, Plot 12, Industrial Area, Gurugram, Haryana 122001\n"
+    "GSTIN: 06ABCDE1234F1Z5\n"
+    "Declaration: The goods sold are intended for end user consumption and not for resale.\n"
+    "Seller Registered Address: Example Retail Pvt Ltd, Sector 44, Gurugram\n"
+    "This is a computer generated invoice. E. & O.E.\n"
+)
+
+
+def synthetic_page(rng: random.Random, i: int) -> str:
+    order_id = "OD" + "".join(rng.choice("0123456789") for _ in range(18))
+    lines = [
+        "Ship To",
+        f"Name: Customer {i}, House {rng.randint(1, 999)}, Some Street",
+        "City Name, State 110001",
+        f"Order ID: {order_id}",
+        f"Order Date: {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2025",
+        f"Invoice No: FATKTF26{rng.randint(0, 99999999):08d}",
+        "Product | SKU | Description | Qty",
+    ]
+    n_items = rng.choice((1, 1, 1, 2, 3))
+    for _ in range(n_items):
+        lines.append(f"atovio Pebble Air Purifier | AT000{rng.randint(1, 4)} | IMEI/SrNo: NA | 1")
+    lines.append(f"TOTAL QTY: {n_items}")
+    return "\n".join(lines) + "\n" + _FILLER * 4
+
+
+def load_pdf_texts(path: str) -> list[str]:
+    from processor import PDFOrderProcessor
+    proc = PDFOrderProcessor(path)
+    try:
+        return proc.page_texts(0, proc.doc_page_count())
+    finally:
+        proc.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="parse_order_page micro-benchmark")
+    ap.add_argument("pdf", nargs="?", help="manifest to take page text from (default: synthetic)")
+    ap.add_argument("--pages", type=int, default=2000, help="synthetic page count")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.pdf:
+        texts = load_pdf_texts(args.pdf)
+    else:
+        rng = random.Random(42)
+        texts = [synthetic_page(rng, i) for i in range(args.pages)]
+
+    mismatches = [i for i, t in enumerate(texts) if parse_order_page(t) != _parse_order_page_multipass(t)]
+
+    for label, fn in (("multi-pass", _parse_order_page_multipass), ("anchored", parse_order_page)):
+        best = min(timeit.repeat(lambda: [fn(t) for t in texts], number=1, repeat=args.repeat))
+        print(f"{label:>12}: {best / len(texts) * 1e6:7.1f} us/page  ({len(texts) / best:9.0f} pages/s)")
+
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} page(s), first: {mismatches[:10]}")
+        sys.exit(1)
+    print(f"results identical on all {len(texts)} page(s)")
+
+
+if __name__ == "__main__":
+    main()
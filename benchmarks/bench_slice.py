@@ -0,0 +1,85 @@
+# benchmarks/bench_slice.py
+# -----------------------------------------------
+# Orders/sec for building order PDFs: the previous PyMuPDF -> tobytes()
+# -> PyPDF2 round-trip vs. the all-PyMuPDF render_order_pages() path.
+#
+#   python benchmarks/bench_slice.py path/to/manifest.pdf [--orders 100] [--labels 1 --invoices 2]
+#
+# Each "order" is one manifest page; outputs go to a temp dir. The legacy
+# path needs PyPDF2 installed.
+# -----------------------------------------------
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+import processor  # noqa: E402
+from config import DEFAULT as CFG  # noqa: E402
+from docpool import POOL  # noqa: E402
+
+
+def legacy_slice(src: fitz.Document, page_index: int, out_pdf: str, labels: int, invoices: int):
+    """The pre-change slicer: two scratch fitz docs, serialized and re-read by PyPDF2."""
+    import PyPDF2
+
+    page = src.load_page(page_index)
+    label_clip, invoice_clip = processor._compute_label_invoice_rects(page.rect, cfg=CFG)
+
+    label_doc = fitz.open()
+    p = label_doc.new_page(width=processor.PAGE_W_PT, height=processor.PAGE_H_PT)
+    p.show_pdf_page(processor._label_dest_rect(label_clip), src, page_index, clip=label_clip,
+                    rotate=0, keep_proportion=True, overlay=True, oc=0)
+
+    inv_doc = fitz.open()
+    p = inv_doc.new_page(width=processor.PAGE_W_PT, height=processor.PAGE_H_PT)
+    p.show_pdf_page(processor._invoice_dest_rect(invoice_clip, CFG.rotate_invoice_deg), src, page_index,
+                    clip=invoice_clip, rotate=CFG.rotate_invoice_deg, keep_proportion=True, overlay=True, oc=0)
+
+    writer = PyPDF2.PdfWriter()
+    label_reader = PyPDF2.PdfReader(io.BytesIO(label_doc.tobytes()))
+    inv_reader = PyPDF2.PdfReader(io.BytesIO(inv_doc.tobytes()))
+    for _ in range(labels):
+        writer.add_page(label_reader.pages[0])
+    for _ in range(invoices):
+        writer.add_page(inv_reader.pages[0])
+    with open(out_pdf, "wb") as f:
+        writer.write(f)
+
+
+def pymupdf_slice(src: fitz.Document, page_index: int, out_pdf: str, labels: int, invoices: int):
+    out = fitz.open()
+    processor.render_order_pages(out, src, page_index, labels, invoices)
+    out.save(out_pdf, deflate=True)
+    out.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Order PDF build throughput")
+    ap.add_argument("pdf")
+    ap.add_argument("--orders", type=int, default=100)
+    ap.add_argument("--labels", type=int, default=1)
+    ap.add_argument("--invoices", type=int, default=2)
+    args = ap.parse_args()
+
+    with POOL.document(args.pdf) as src, tempfile.TemporaryDirectory() as tmp:
+        n = min(args.orders, src.page_count)
+        for label, fn in (("pypdf2 round-trip", legacy_slice), ("pymupdf only", pymupdf_slice)):
+            t0 = time.perf_counter()
+            size = 0
+            for i in range(n):
+                out_pdf = os.path.join(tmp, f"{i}.pdf")
+                fn(src, i, out_pdf, args.labels, args.invoices)
+                size += os.path.getsize(out_pdf)
+            elapsed = time.perf_counter() - t0
+            print(f"{label:>18}: {n / elapsed:7.1f} orders/s | avg {size / n / 1024:6.1f} KiB/order")
+
+
+if __name__ == "__main__":
+    main()
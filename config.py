@@ -41,5 +41,61 @@ class SplitConfig:
     # Rotation for invoice pages
     rotate_invoice_deg: int = 90
 
+    # Clipped text extraction (RuntimeConfig.text_mode = "clipped"), fractions of page height.
+    # Text is read from one full-width band [text_label_from_frac, text_invoice_to_frac], from the
+    # top of the label to the end of the invoice lines; everything below (T&C, signature block) is skipped.
+    # Check a sample manifest with benchmarks/bench_extract.py before changing these.
+    text_label_from_frac: float = 0.0
+    text_invoice_to_frac: float = 0.85
+
 # Single source of truth for Project 2
 DEFAULT = SplitConfig()
+
+
+@dataclass
+class RuntimeConfig:
+    # --- Upload parsing ---
+    # Worker processes for page parsing. 0 = one per CPU, 1 = parse in-process.
+    parse_workers: int = 0
+    # Pages handed to a worker at a time (each worker opens its own fitz document)
+    parse_chunk_pages: int = 50
+    # Keep extracted page text in out/cache/pagetext.sqlite3 (keyed by file hash + page)
+    text_cache: bool = True
+    # "full" = whole page text; "clipped" = only the SplitConfig text band (see above)
+    text_mode: str = "full"
+
+    # --- Rendering ---
+    # Source manifests kept open between renders (LRU, per process)
+    doc_pool_size: int = 4
+    # After an upload is parsed, render label/invoice slices for its pending orders in the
+    # background (out/cache/slices/), so completing an order only assembles cached pages
+    prerender_slices: bool = False
+    # /bulk_print: orders rendered per worker task (workers come from parse_workers)
+    render_batch_orders: int = 25
+
+    # --- Output ---
+    # "per_order" = out/<order_id>.pdf per completed order; "batch" = append completed orders
+    # to a rolling out/batches/<batch id>.pdf (see printbatch.py)
+    output_mode: str = "per_order"
+    # A batch is closed at this many orders, or this long after its first order
+    batch_max_orders: int = 50
+    batch_max_age_s: float = 300.0
+
+    # --- Thermal raster output (/raster/<order_id>/<label|invoice>.<png|pbm|zpl>, see raster.py) ---
+    # Printer resolution; the bitmap is SplitConfig page size at this dpi
+    raster_dpi: int = 203
+    # Gray level (0-255) below which a dot is printed black
+    raster_threshold: int = 128
+
+    # --- Print queue (see spooler.py) ---
+    # "off", "stub" (log only), "directory" (copy into spool_dir) or "command" (run spool_command)
+    spool_sink: str = "off"
+    spool_dir: str = "out/print_drop"
+    # {path} is replaced by the PDF, e.g. 'PDFtoPrinter.exe "{path}"'
+    spool_command: str = ""
+    # Attempts per job before it is marked failed; retries back off from spool_retry_s, doubling
+    spool_max_attempts: int = 5
+    spool_retry_s: float = 5.0
+
+
+RUNTIME = RuntimeConfig()
@@ -6,41 +6,77 @@
 #   data/sku_master.csv    -> sku,display_name,type (Compulsory|Loose)
 #   data/extras_noscan.csv -> sku
 #   data/print_rules.csv   -> sku,labels,invoices (DEFAULT row allowed)
+#   data/master.xlsx       -> all three as sheets; used instead of the CSVs
+#                             when present (validated, see masterimport.py)
 #
 # Bulk-print:
 #   - Selected SKU is treated as Loose, regardless of master type
 #   - Tokens assigned as: BULK-{sku}-{0001..}
+#
+# Hot reload:
+#   The three files are read into one immutable snapshot (_MasterData).
+#   load_master_data() re-stats them at most every MASTER_CHECK_INTERVAL_S
+#   and, when an mtime or size changed, builds a new snapshot and swaps it
+#   in with a single assignment; readers keep whichever snapshot they got.
+#   A file that fails to load (e.g. saved half-way) keeps the old snapshot.
+#
+# SKU table:
+#   Records are frozen, slotted SKUInfo objects with labels/invoices already
+#   resolved (print_rules.csv row, else its DEFAULT row), so a lookup is a
+#   dict hit. Unknown SKUs get a synthesized Loose/DEFAULT record from a
+#   bounded per-snapshot cache (UNKNOWN_SKU_CACHE_SIZE), never the table.
 # -----------------------------------------------
 
 import csv
 import os
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 SKU_MASTER_CSV = os.path.join(DATA_DIR, "sku_master.csv")
 EXTRAS_NOSCAN_CSV = os.path.join(DATA_DIR, "extras_noscan.csv")
 PRINT_RULES_CSV = os.path.join(DATA_DIR, "print_rules.csv")
+# When present, replaces the three CSVs (one workbook, see masterimport.py)
+MASTER_XLSX = os.path.join(DATA_DIR, "master.xlsx")
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SKUInfo:
     sku: str
     display_name: str
     type: str              # "Compulsory" or "Loose"
     noscan: bool = False   # in extras_noscan.csv
-    labels: int = 1
+    labels: int = 1        # print_rules.csv, else its DEFAULT row
     invoices: int = 2
 
 
-_master_loaded = False
-_sku_info: dict[str, SKUInfo] = {}
-_default_labels = 1
-_default_invoices = 2
-_extras_noscan: set[str] = set()
+@dataclass(frozen=True)
+class _MasterData:
+    sku_info: Mapping[str, SKUInfo]
+    extras_noscan: frozenset[str]
+    default_labels: int
+    default_invoices: int
+    signature: tuple       # (mtime_ns, size) per file, None if missing
+    generation: int        # bumped on every successful (re)load
+    # Bounded negative cache: synthesized records for SKUs not in the table (see _lookup)
+    unknown: dict[str, SKUInfo] = field(default_factory=dict, compare=False, repr=False)
+
 
+MASTER_CHECK_INTERVAL_S = 1.0
+UNKNOWN_SKU_CACHE_SIZE = 1024
+_MASTER_FILES = (SKU_MASTER_CSV, EXTRAS_NOSCAN_CSV, PRINT_RULES_CSV, MASTER_XLSX)
 
-def _load_sku_master():
-    global _sku_info
+_master = _MasterData(MappingProxyType({}), frozenset(), 1, 2, signature=(), generation=0)
+_master_lock = threading.Lock()
+_next_check = 0.0
+_failed_signature: tuple | None = None
+_unknown_lock = threading.Lock()
+
+
+def _load_sku_master(sku_info: dict[str, dict]):
     if not os.path.exists(SKU_MASTER_CSV):
         return
 
@@ -55,20 +91,19 @@ def _load_sku_master():
             if type_ not in ("Compulsory", "Loose"):
                 type_ = "Loose"
 
-            if sku in _sku_info:
-                info = _sku_info[sku]
-                info.display_name = display_name or info.display_name
-                info.type = type_
+            if sku in sku_info:
+                info = sku_info[sku]
+                info["display_name"] = display_name or info["display_name"]
+                info["type"] = type_
             else:
-                _sku_info[sku] = SKUInfo(
+                sku_info[sku] = dict(
                     sku=sku,
                     display_name=display_name or sku,
                     type=type_
                 )
 
 
-def _load_extras_noscan():
-    global _extras_noscan, _sku_info
+def _load_extras_noscan(sku_info: dict[str, dict], extras_noscan: set[str]):
     if not os.path.exists(EXTRAS_NOSCAN_CSV):
         return
 
@@ -77,11 +112,11 @@ def _load_extras_noscan():
             sku = line.strip().upper()
             if not sku or sku.startswith("#"):
                 continue
-            _extras_noscan.add(sku)
-            if sku in _sku_info:
-                _sku_info[sku].noscan = True
+            extras_noscan.add(sku)
+            if sku in sku_info:
+                sku_info[sku]["noscan"] = True
             else:
-                _sku_info[sku] = SKUInfo(
+                sku_info[sku] = dict(
                     sku=sku,
                     display_name=sku,
                     type="Loose",
@@ -89,10 +124,11 @@ def _load_extras_noscan():
                 )
 
 
-def _load_print_rules():
-    global _default_labels, _default_invoices, _sku_info
+def _load_print_rules(sku_info: dict[str, dict]) -> tuple[int, int]:
+    """Returns the DEFAULT (labels, invoices)."""
+    default_labels, default_invoices = 1, 2
     if not os.path.exists(PRINT_RULES_CSV):
-        return
+        return default_labels, default_invoices
 
     with open(PRINT_RULES_CSV, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -105,66 +141,140 @@ def _load_print_rules():
             invoices = int(row.get("invoices") or 2)
 
             if sku == "DEFAULT":
-                _default_labels = labels
-                _default_invoices = invoices
+                default_labels = labels
+                default_invoices = invoices
                 continue
 
-            if sku in _sku_info:
-                info = _sku_info[sku]
-                info.labels = labels
-                info.invoices = invoices
+            if sku in sku_info:
+                info = sku_info[sku]
+                info["labels"] = labels
+                info["invoices"] = invoices
             else:
-                _sku_info[sku] = SKUInfo(
+                sku_info[sku] = dict(
                     sku=sku,
                     display_name=sku,
                     type="Loose",
                     labels=labels,
                     invoices=invoices
                 )
+    return default_labels, default_invoices
 
 
-def load_master_data():
-    """Idempotent loader — safe to call many times."""
-    global _master_loaded
-    if _master_loaded:
-        return
-    os.makedirs(DATA_DIR, exist_ok=True)
-    _load_sku_master()
-    _load_extras_noscan()
-    _load_print_rules()
-    _master_loaded = True
+def _signature() -> tuple:
+    sig = []
+    for path in _MASTER_FILES:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
 
 
-def get_sku_info(sku: str) -> SKUInfo:
-    """Return SKUInfo; if not present, synthesize a Loose/default one."""
-    load_master_data()
-    sku = (sku or "").strip().upper()
-    if sku in _sku_info:
-        info = _sku_info[sku]
-        # Fill missing labels/invoices from defaults
-        if info.labels <= 0:
-            info.labels = _default_labels
-        if info.invoices <= 0:
-            info.invoices = _default_invoices
+def compile_sku_table(drafts: dict[str, dict], default_labels: int,
+                      default_invoices: int) -> dict[str, SKUInfo]:
+    """Freeze draft rows ({sku, display_name, type, noscan?, labels?, invoices?}) into
+    SKUInfo records, with missing or non-positive counts taken from the defaults."""
+    table = {}
+    for sku, d in drafts.items():
+        labels = d.get("labels") or 0
+        invoices = d.get("invoices") or 0
+        table[sku] = SKUInfo(
+            sku=sku,
+            display_name=d.get("display_name") or sku,
+            type=d.get("type") or "Loose",
+            noscan=bool(d.get("noscan")),
+            labels=labels if labels > 0 else default_labels,
+            invoices=invoices if invoices > 0 else default_invoices,
+        )
+    return table
+
+
+def _build_master(signature: tuple, generation: int) -> _MasterData:
+    if os.path.exists(MASTER_XLSX):
+        # pandas/openpyxl are only imported when a workbook is actually used
+        from masterimport import import_master
+        imported = import_master(MASTER_XLSX)
+        drafts, extras = imported.drafts, imported.extras
+        default_labels, default_invoices = imported.default_labels, imported.default_invoices
+    else:
+        drafts: dict[str, dict] = {}
+        extras: set[str] = set()
+        _load_sku_master(drafts)
+        _load_extras_noscan(drafts, extras)
+        default_labels, default_invoices = _load_print_rules(drafts)
+    table = compile_sku_table(drafts, default_labels, default_invoices)
+    return _MasterData(MappingProxyType(table), frozenset(extras),
+                       default_labels, default_invoices, signature, generation)
+
+
+def load_master_data(force: bool = False) -> _MasterData:
+    """Current master-data snapshot — cheap, safe to call on every request.
+
+    Files are re-stat'ed at most every MASTER_CHECK_INTERVAL_S and only
+    re-read when their mtime/size changed (or force=True)."""
+    global _master, _next_check, _failed_signature
+    now = time.monotonic()
+    if not force and now < _next_check:
+        return _master
+    with _master_lock:
+        if not force and now < _next_check:
+            return _master
+        _next_check = now + MASTER_CHECK_INTERVAL_S
+        os.makedirs(DATA_DIR, exist_ok=True)
+        sig = _signature()
+        if not force and (sig == _master.signature or sig == _failed_signature):
+            return _master
+        try:
+            _master = _build_master(sig, _master.generation + 1)
+            _failed_signature = None
+            if _master.generation > 1:
+                print(f"[MASTER DATA] reloaded (generation {_master.generation}, {len(_master.sku_info)} SKUs)")
+        except Exception as e:
+            if _master.generation == 0:
+                raise
+            # Keep serving the last good table until the files change again
+            _failed_signature = sig
+            print(f"[MASTER DATA] reload failed, keeping generation {_master.generation}: {e}")
+        return _master
+
+
+def master_generation() -> int:
+    """Bumped whenever the master data was reloaded (for cache keys / ETags)."""
+    return load_master_data().generation
+
+
+def _lookup(m: _MasterData, sku: str) -> SKUInfo:
+    info = m.sku_info.get(sku) or m.unknown.get(sku)
+    if info is not None:
         return info
 
+    # Unknown SKU: one shared Loose/default record, kept in a bounded cache so junk
+    # scans can neither grow the table nor allocate on every lookup
     info = SKUInfo(
         sku=sku,
         display_name=sku,
         type="Loose",
-        noscan=(sku in _extras_noscan),
-        labels=_default_labels,
-        invoices=_default_invoices,
+        noscan=(sku in m.extras_noscan),
+        labels=m.default_labels,
+        invoices=m.default_invoices,
     )
-    _sku_info[sku] = info
+    with _unknown_lock:
+        if len(m.unknown) >= UNKNOWN_SKU_CACHE_SIZE:
+            m.unknown.pop(next(iter(m.unknown)))   # oldest first
+        m.unknown[sku] = info
     return info
 
 
+def get_sku_info(sku: str) -> SKUInfo:
+    """Return SKUInfo; if not present, synthesize a Loose/default one."""
+    return _lookup(load_master_data(), (sku or "").strip().upper())
+
+
 def is_noscan_sku(sku: str) -> bool:
-    load_master_data()
-    return sku.strip().upper() in _extras_noscan
+    return sku.strip().upper() in load_master_data().extras_noscan
 
 
 def get_print_counts_for_sku(sku: str) -> tuple[int, int]:
     info = get_sku_info(sku)
-    return info.labels or _default_labels, info.invoices or _default_invoices
+    return info.labels, info.invoices
@@ -0,0 +1,93 @@
+# docpool.py
+# -----------------------------------------------
+# Bounded LRU pool of open source PDFs.
+#
+# Opening a 1000-page manifest re-parses its xref table; rendering each
+# completed order used to pay that again. The pool keeps the most
+# recently used documents open, keyed by (path, mtime, size) so a file
+# replaced on disk is reopened, and closes documents as they fall out.
+#
+# PyMuPDF documents must not be used from several threads at once, so a
+# document is only handed out inside `with POOL.document(path) as doc:`,
+# which holds the pool lock for the duration. Never keep `doc` after the
+# block: it may be closed once evicted.
+# -----------------------------------------------
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+from config import RUNTIME
+
+
+class DocumentPool:
+    def __init__(self, max_docs: int = 4):
+        self.max_docs = max(1, max_docs)
+        self._docs: OrderedDict[tuple, fitz.Document] = OrderedDict()
+        self._in_use: dict[tuple, int] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path: str) -> tuple:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    @contextmanager
+    def document(self, path: str):
+        with self._lock:
+            key, doc = self._acquire(path)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            try:
+                yield doc
+            finally:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+                self._trim()
+
+    def _acquire(self, path: str) -> tuple[tuple, fitz.Document]:
+        key = self._key(path)
+        doc = self._docs.get(key)
+        if doc is not None:
+            self.hits += 1
+            self._docs.move_to_end(key)
+            return key, doc
+
+        self.misses += 1
+        # Same path with an older mtime/size: the file changed, drop the stale copy
+        for stale in [k for k in self._docs if k[0] == key[0] and k not in self._in_use]:
+            self._docs.pop(stale).close()
+
+        doc = fitz.open(key[0])
+        self._docs[key] = doc
+        return key, doc
+
+    def _trim(self):
+        # Close least recently used documents beyond max_docs (never one that is in use
+        # further up the stack, e.g. a nested `with` in the same thread)
+        for key in list(self._docs):
+            if len(self._docs) <= self.max_docs:
+                break
+            if key not in self._in_use:
+                self._docs.pop(key).close()
+
+    def close_all(self):
+        with self._lock:
+            while self._docs:
+                _, doc = self._docs.popitem()
+                doc.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._docs), "max": self.max_docs,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# Shared by PDFOrderProcessor and the slicer (one pool per process)
+POOL = DocumentPool(RUNTIME.doc_pool_size)
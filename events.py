@@ -0,0 +1,79 @@
+# events.py
+# -----------------------------------------------
+# In-process publish/subscribe for the /events Server-Sent Events stream.
+#
+# Every connected packing screen gets its own bounded queue. Publishers
+# (upload, scan, bulk print) never block: if a screen stops reading and
+# its queue fills up, the backlog is replaced by a single "resync" event
+# and the client re-reads /orders?since=<version>.
+# -----------------------------------------------
+
+import json
+import queue
+import threading
+from itertools import count
+
+KEEPALIVE_S = 15.0
+
+
+class EventBus:
+    def __init__(self, max_queue: int = 1024):
+        self.max_queue = max_queue
+        self._subs: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        self._ids = count(1)
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subs.discard(q)
+
+    def publish(self, event: str, data: dict):
+        with self._lock:
+            msg = (next(self._ids), event, data)
+            for q in self._subs:
+                try:
+                    q.put_nowait(msg)
+                except queue.Full:
+                    _drain(q)
+                    q.put_nowait((msg[0], "resync", {}))
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def stream(self, q: queue.Queue):
+        """Generator of SSE frames for one subscriber; unsubscribes when the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event_id, event, data = q.get(timeout=KEEPALIVE_S)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data, event_id)
+        finally:
+            self.unsubscribe(q)
+
+
+def _drain(q: queue.Queue):
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
+
+
+def format_sse(event: str, data: dict, event_id: int | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
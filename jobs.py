@@ -0,0 +1,101 @@
+# jobs.py
+# -----------------------------------------------
+# Background jobs (uploads, and anything else too slow for a request).
+#
+# A job is submitted with a function that receives the Job object and
+# updates its progress counters as it goes; /jobs/<id> reports them.
+# Jobs run on a small thread pool; heavy CPU work inside a job (page
+# parsing) is still fanned out to the process pool in pipeline.py.
+# -----------------------------------------------
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = "queued"          # queued | running | done | error
+    pages_total: int = 0
+    pages_parsed: int = 0
+    orders_found: int = 0
+    skipped_pages: list[int] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    result: dict = field(default_factory=dict)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or now) - self.started_at
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "pages_total": self.pages_total,
+            "pages_parsed": self.pages_parsed,
+            "orders_found": self.orders_found,
+            "skipped_pages": list(self.skipped_pages),
+            "queued_s": round((self.started_at or now) - self.created_at, 3),
+            "elapsed_s": round(elapsed, 3) if elapsed is not None else None,
+            "pages_per_s": round(self.pages_parsed / elapsed, 1) if elapsed else None,
+            "error": self.error,
+            "result": dict(self.result),
+        }
+
+
+class JobRunner:
+    def __init__(self, max_workers: int = 1, keep: int = 100):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._keep = keep
+
+    def submit(self, kind: str, fn, on_done=None) -> Job:
+        """Run fn(job) in the background. on_done(job) is called when it finishes (either way)."""
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn, on_done)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn, on_done):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            fn(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+            print(f"[JOB ERROR] {job.kind} {job.id}: {e}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            if on_done is not None:
+                try:
+                    on_done(job)
+                except Exception as e:
+                    print(f"[JOB CALLBACK ERROR] {job.kind} {job.id}: {e}")
+            job.done.set()
+
+    def _prune(self):
+        # Drop the oldest finished jobs beyond `keep`
+        finished = [j.id for j in self._jobs.values() if j.status in ("done", "error")]
+        for job_id in finished[: max(0, len(self._jobs) - self._keep)]:
+            del self._jobs[job_id]
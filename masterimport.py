@@ -0,0 +1,187 @@
+# masterimport.py
+# -----------------------------------------------
+# Bulk master-data import (XLSX workbook or the three CSVs) with pandas.
+#
+# The catalog team keeps SKUs in one workbook; drop it in as
+# data/master.xlsx and db.py loads it instead of the CSVs (hot reload
+# included). Sheets, matched case-insensitively:
+#   sku_master    (or skus)    -> sku, display_name, type (Compulsory|Loose)
+#   extras_noscan (or noscan)  -> sku
+#   print_rules   (or rules)   -> sku, labels, invoices (DEFAULT row allowed)
+#
+# Every sheet is read in one pass and validated column-wise: empty or
+# duplicate SKUs, unknown types and non-integer / negative counts are
+# all reported together as a MasterDataError, and nothing is loaded.
+#
+# Check a workbook before dropping it in:
+#   python masterimport.py catalog.xlsx
+#   python masterimport.py data/          # the CSVs in a directory
+# -----------------------------------------------
+
+import os
+import sys
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+SHEETS = {
+    "sku_master": ("sku_master", "skus"),
+    "extras_noscan": ("extras_noscan", "noscan"),
+    "print_rules": ("print_rules", "rules"),
+}
+TYPES = ("Compulsory", "Loose")
+MAX_LISTED = 20
+
+
+class MasterDataError(ValueError):
+    def __init__(self, source: str, errors: list[str]):
+        self.errors = errors
+        super().__init__(f"{source}: {len(errors)} problem(s): " + "; ".join(errors))
+
+
+@dataclass
+class MasterImport:
+    drafts: dict[str, dict]           # sku -> draft row for db.compile_sku_table()
+    extras: set[str]
+    default_labels: int = 1
+    default_invoices: int = 2
+    counts: dict[str, int] = field(default_factory=dict)
+
+
+def _listed(values) -> str:
+    values = list(dict.fromkeys(values))
+    more = f" (+{len(values) - MAX_LISTED} more)" if len(values) > MAX_LISTED else ""
+    return ", ".join(map(str, values[:MAX_LISTED])) + more
+
+
+def read_frames(path: str) -> dict[str, pd.DataFrame]:
+    """{sheet key: DataFrame of strings} from an .xlsx workbook or a directory of CSVs."""
+    if os.path.isdir(path):
+        frames = {}
+        for key in SHEETS:
+            csv_path = os.path.join(path, f"{key}.csv")
+            if os.path.exists(csv_path):
+                frames[key] = pd.read_csv(csv_path, dtype=str, comment="#", skip_blank_lines=True)
+        return frames
+
+    book = pd.read_excel(path, sheet_name=None, dtype=str, engine="openpyxl")
+    by_name = {name.strip().lower(): df for name, df in book.items()}
+    frames = {}
+    for key, aliases in SHEETS.items():
+        for alias in aliases:
+            if alias in by_name:
+                frames[key] = by_name[alias]
+                break
+    return frames
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    if "sku" not in df.columns:
+        df["sku"] = pd.NA
+    df["sku"] = df["sku"].fillna("").astype(str).str.strip().str.upper()
+    return df
+
+
+def _counts(df: pd.DataFrame, column: str, default: int, sheet: str, errors: list[str]) -> pd.Series:
+    """Integer column, default for blanks; non-integers and negatives go to errors."""
+    raw = df[column] if column in df.columns else pd.Series(pd.NA, index=df.index, dtype=object)
+    raw = raw.astype("string").str.strip()
+    blank = raw.isna() | (raw == "")
+    num = pd.to_numeric(raw.mask(blank), errors="coerce")
+    bad = ~blank & (num.isna() | (num % 1 != 0) | (num < 0))
+    if bad.any():
+        errors.append(f"{sheet}: non-integer {column} for {_listed(df.loc[bad, 'sku'])}")
+    return num.where(~blank, default).fillna(default).astype(int)
+
+
+def import_master(path: str) -> MasterImport:
+    """Read and validate master data; raises MasterDataError listing every problem found."""
+    frames = {key: _normalize(df) for key, df in read_frames(path).items()}
+    errors: list[str] = []
+    if "sku_master" not in frames:
+        raise MasterDataError(path, ["no sku_master sheet"])
+
+    # --- sku master ---
+    master = frames["sku_master"]
+    if (master["sku"] == "").any():
+        errors.append(f"sku_master: {int((master['sku'] == '').sum())} row(s) without a SKU")
+    master = master[master["sku"] != ""]
+    dup = master["sku"].duplicated(keep=False)
+    if dup.any():
+        errors.append(f"sku_master: duplicate SKUs {_listed(master.loc[dup, 'sku'])}")
+    types = (master["type"] if "type" in master.columns else pd.Series("", index=master.index))
+    types = types.fillna("").astype(str).str.strip().str.capitalize().replace("", "Loose")
+    bad_type = ~types.isin(TYPES)
+    if bad_type.any():
+        errors.append(f"sku_master: type must be Compulsory or Loose for {_listed(master.loc[bad_type, 'sku'])}")
+    names = (master["display_name"] if "display_name" in master.columns else pd.Series(pd.NA, index=master.index))
+    names = names.astype("string").str.strip().replace("", pd.NA).fillna(master["sku"])
+
+    # --- extras (noscan) ---
+    extras_df = frames.get("extras_noscan")
+    extras = set() if extras_df is None else set(extras_df.loc[extras_df["sku"] != "", "sku"])
+
+    # --- print rules ---
+    default_labels, default_invoices = 1, 2
+    rules = frames.get("print_rules")
+    if rules is not None:
+        rules = rules[rules["sku"] != ""].copy()
+        dup = rules["sku"].duplicated(keep=False)
+        if dup.any():
+            errors.append(f"print_rules: duplicate SKUs {_listed(rules.loc[dup, 'sku'])}")
+        rules["labels"] = _counts(rules, "labels", 1, "print_rules", errors)
+        rules["invoices"] = _counts(rules, "invoices", 2, "print_rules", errors)
+        is_default = rules["sku"] == "DEFAULT"
+        if is_default.any():
+            default_labels = int(rules.loc[is_default, "labels"].iloc[-1])
+            default_invoices = int(rules.loc[is_default, "invoices"].iloc[-1])
+        rules = rules[~is_default]
+
+    if errors:
+        raise MasterDataError(path, errors)
+
+    # --- one row per SKU from any sheet; absent counts (0) resolve to DEFAULT in compile ---
+    table = pd.DataFrame({"display_name": names.values, "type": types.values}, index=master["sku"].values)
+    index = table.index.union(pd.Index(sorted(extras))).union(
+        pd.Index(rules["sku"]) if rules is not None else pd.Index([]))
+    table = table.reindex(index)
+    table["display_name"] = table["display_name"].fillna(pd.Series(index, index=index))
+    table["type"] = table["type"].fillna("Loose")
+    table["noscan"] = index.isin(list(extras))
+    if rules is not None:
+        by_sku = rules.set_index("sku")
+        table["labels"] = by_sku["labels"].reindex(index).fillna(0).astype(int)
+        table["invoices"] = by_sku["invoices"].reindex(index).fillna(0).astype(int)
+    else:
+        table["labels"] = 0
+        table["invoices"] = 0
+
+    table.index.name = "sku"
+    drafts = {row["sku"]: row for row in table.reset_index().to_dict("records")}
+    return MasterImport(
+        drafts=drafts,
+        extras=extras,
+        default_labels=default_labels,
+        default_invoices=default_invoices,
+        counts={"skus": len(master), "noscan": len(extras), "print_rules": 0 if rules is None else len(rules)},
+    )
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 2:
+        print("usage: python masterimport.py <workbook.xlsx | csv directory>")
+        return 2
+    try:
+        result = import_master(argv[1])
+    except MasterDataError as e:
+        for err in e.errors:
+            print(f"ERROR {err}")
+        return 1
+    print(f"OK {len(result.drafts)} SKUs ({result.counts}), "
+          f"DEFAULT labels={result.default_labels} invoices={result.default_invoices}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,5 +1,6 @@
 
 import re
+from dataclasses import dataclass, field
 
 # Regexes tailored to the user's Flipkart-style PDF text
 RE_ORDER_ID = re.compile(r"\b(OD[A-Z0-9]{18})\b")
@@ -12,11 +13,28 @@ RE_TOTAL_QTY = re.compile(r"TOTAL\s*QTY:\s*(\d{1,2})", re.IGNORECASE)
 RE_SKU_IN_CONTEXT = re.compile(r"Purifier\s*\|\s*(AT\d{4})\s*\|\s*IMEI/SrNo", re.IGNORECASE)
 RE_SKU_FALLBACK = re.compile(r"\b(AT\d{4})\b")
 
+RE_DATE_SEP = re.compile(r"[-/]")
+
+# SKU used when a page has a TOTAL QTY but no recognisable SKU
+PLACEHOLDER_SKU = "AT0000"
+
+# Keyword each field regex must start with, and whether it is matched case-insensitively.
+# parse_order_page() finds these with str.find (on a lowercased copy of the page for the
+# IGNORECASE fields) and only runs the field regex where a keyword occurs.
+_ANCHORS = {
+    "order_id": ("OD", RE_ORDER_ID, False),
+    "date": ("order", RE_DATE, True),
+    "invoice": ("invoice", RE_INVOICE, True),
+    "name": ("Name:", RE_NAME, False),
+    "total_qty": ("total", RE_TOTAL_QTY, True),
+}
+_SKU_ANCHOR = "purifier"  # RE_SKU_IN_CONTEXT
+
 def normalize_ddmmyyyy(s: str|None) -> str|None:
     if not s:
         return None
     # Accept dd-mm-yyyy or dd/mm/yyyy and normalize to dd/mm/yyyy
-    parts = re.split(r"[-/]", s.strip())
+    parts = RE_DATE_SEP.split(s.strip())
     if len(parts) == 3:
         d, m, y = parts
         if len(y) == 2:
@@ -24,24 +42,7 @@ def normalize_ddmmyyyy(s: str|None) -> str|None:
         return f"{int(d):02d}/{int(m):02d}/{int(y):04d}"
     return s
 
-def parse_order_page(text: str):
-    if not text:
-        return None
-    order_id_m = RE_ORDER_ID.search(text)
-    date_m = RE_DATE.search(text)
-    inv_m = RE_INVOICE.search(text)
-    name_m = RE_NAME.search(text)
-
-    # SKUs: prefer context-based; if none found, fallback to any ATdddd
-    context_skus = RE_SKU_IN_CONTEXT.findall(text)
-    skus = context_skus if context_skus else RE_SKU_FALLBACK.findall(text)
-
-    # Qty: if explicit TOTAL QTY, use that; otherwise count per SKU occurrence
-    qty_total = None
-    m = RE_TOTAL_QTY.search(text)
-    if m:
-        qty_total = int(m.group(1))
-
+def _build_result(order_id, invoice, name, date, skus, qty_total):
     items = []
     if skus:
         # If multiple occurrences of same SKU, count occurrences as qty if TOTAL QTY isn't trustworthy per-line
@@ -52,15 +53,132 @@ def parse_order_page(text: str):
             items.append({"sku": s, "qty": c})
     elif qty_total is not None:
         # No SKU found but qty exists -> create a placeholder
-        items.append({"sku": "AT0000", "qty": qty_total})
+        items.append({"sku": PLACEHOLDER_SKU, "qty": qty_total})
 
-    if not order_id_m or not items:
+    if not order_id or not items:
         return None
 
     return {
-        "order_id": order_id_m.group(1),
-        "invoice_number": inv_m.group(1) if inv_m else None,
-        "name": name_m.group(1).strip() if name_m else None,
-        "date": date_m.group(1) if date_m else None,
+        "order_id": order_id,
+        "invoice_number": invoice,
+        "name": name.strip() if name else None,
+        "date": date,
         "items": items,
     }
+
+def _first_anchored(text: str, hay: str, anchor: str, rx):
+    """Leftmost rx match in text, trying only positions where `anchor` occurs in hay."""
+    p = hay.find(anchor)
+    while p != -1:
+        m = rx.match(text, p)
+        if m:
+            return m.group(1)
+        p = hay.find(anchor, p + 1)
+    return None
+
+def parse_order_page(text: str):
+    """Extract order fields from one page's text.
+
+    The page is lowercased once; each field regex then runs only at the
+    offsets where its keyword occurs instead of being searched across the
+    whole page. Results are identical to _parse_order_page_multipass()."""
+    if not text:
+        return None
+
+    low = text.lower()
+    if len(low) != len(text):
+        # A few non-ASCII characters change length when lowercased, which
+        # would shift offsets between the two strings: use the plain path.
+        return _parse_order_page_multipass(text)
+
+    fields = {}
+    for key, (anchor, rx, fold) in _ANCHORS.items():
+        fields[key] = _first_anchored(text, low if fold else text, anchor, rx)
+
+    # SKUs: prefer context-based; if none found, fallback to any ATdddd
+    skus = []
+    p = low.find(_SKU_ANCHOR)
+    while p != -1:
+        m = RE_SKU_IN_CONTEXT.match(text, p)
+        if m:
+            skus.append(m.group(1))
+            p = low.find(_SKU_ANCHOR, m.end())
+        else:
+            p = low.find(_SKU_ANCHOR, p + 1)
+    if not skus:
+        skus = RE_SKU_FALLBACK.findall(text)
+
+    qty_total = fields["total_qty"]
+    return _build_result(
+        fields["order_id"],
+        fields["invoice"],
+        fields["name"],
+        fields["date"],
+        skus,
+        int(qty_total) if qty_total is not None else None,
+    )
+
+@dataclass
+class ParseStats:
+    pages: int = 0
+    parsed: int = 0
+    skipped: int = 0
+    placeholder_items: int = 0   # AT0000 lines (qty found, SKU not)
+    skipped_pages: list[int] = field(default_factory=list)
+
+    def merge(self, other: "ParseStats"):
+        self.pages += other.pages
+        self.parsed += other.parsed
+        self.skipped += other.skipped
+        self.placeholder_items += other.placeholder_items
+        self.skipped_pages.extend(other.skipped_pages)
+
+def parse_order_pages(texts, start: int = 0, stats: ParseStats | None = None):
+    """Lazily parse an iterable of page texts.
+
+    Yields (page_index, parsed_or_None), numbering pages from `start`, and
+    tallies into `stats` as it goes (pass your own ParseStats to read the
+    totals, or to accumulate across several batches)."""
+    if stats is None:
+        stats = ParseStats()
+    parse = parse_order_page
+    for page_index, text in enumerate(texts, start):
+        parsed = parse(text)
+        stats.pages += 1
+        if parsed is None:
+            stats.skipped += 1
+            stats.skipped_pages.append(page_index)
+        else:
+            stats.parsed += 1
+            for it in parsed["items"]:
+                if it["sku"] == PLACEHOLDER_SKU:
+                    stats.placeholder_items += 1
+        yield page_index, parsed
+
+def _parse_order_page_multipass(text: str):
+    """One full-page search per field. Reference implementation for
+    benchmarks/bench_parse.py and the fallback for text whose length
+    changes when lowercased."""
+    if not text:
+        return None
+    order_id_m = RE_ORDER_ID.search(text)
+    date_m = RE_DATE.search(text)
+    inv_m = RE_INVOICE.search(text)
+    name_m = RE_NAME.search(text)
+
+    # SKUs: prefer context-based; if none found, fallback to any ATdddd
+    context_skus = RE_SKU_IN_CONTEXT.findall(text)
+    skus = context_skus if context_skus else RE_SKU_FALLBACK.findall(text)
+
+    # Qty: if explicit TOTAL QTY, use that; otherwise count per SKU occurrence
+    m = RE_TOTAL_QTY.search(text)
+    qty_total = int(m.group(1)) if m else None
+
+    return _build_result(
+        order_id_m.group(1) if order_id_m else None,
+        inv_m.group(1) if inv_m else None,
+        name_m.group(1) if name_m else None,
+        date_m.group(1) if date_m else None,
+        skus,
+        qty_total,
+    )
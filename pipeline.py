@@ -0,0 +1,184 @@
+# pipeline.py
+# -----------------------------------------------
+# Upload parsing pipeline (and batch rendering for /bulk_print).
+#
+# Pages are split into contiguous ranges and parsed in a process pool;
+# each worker opens its own fitz document (PyMuPDF objects can't be
+# shared across processes). Results come back in page order, one chunk
+# at a time, so the caller can store the first orders while later pages
+# are still being parsed.
+#
+# Bulk rendering uses the same pool: each worker renders a batch of
+# orders, writes their out/<order_id>.pdf files and returns the batch
+# already merged as PDF bytes, which the parent appends to the bulk PDF
+# as batches arrive. One failing order is reported, not fatal.
+#
+# Worker functions live here, not in app.py. Workers are spawned on every
+# platform and re-import app.py as __mp_main__, so app.py keeps its start-up
+# (store, threads, print queue) in init_app(), which only runs under
+# __main__.
+# -----------------------------------------------
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from config import RUNTIME
+from parsers import ParseStats, parse_order_pages
+from processor import PDFOrderProcessor
+from slicecache import SliceCache
+from textcache import default_cache
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return RUNTIME.parse_workers or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Shared pool, started on first use so worker start-up is paid once per app run."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn everywhere (Linux defaults to fork): forking the threaded app could copy
+            # a held lock or sqlite connection, and open fitz documents would share a
+            # file offset; spawned workers start clean, as they always did on Windows
+            _pool = ProcessPoolExecutor(max_workers=_worker_count(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def parse_page_range(pdf_path: str, start: int, stop: int,
+                     pdf_hash: str | None = None) -> tuple[list[tuple[int, dict | None]], ParseStats]:
+    """Parse pages [start, stop) of one PDF. Runs inside a worker process.
+
+    With a pdf_hash (and RUNTIME.text_cache on), page text comes from / goes to
+    the persistent text cache, so re-parsing a known file skips extraction."""
+    cache = default_cache() if (pdf_hash and RUNTIME.text_cache) else None
+    proc = PDFOrderProcessor(pdf_path, pdf_hash=pdf_hash, text_cache=cache)
+    try:
+        texts = proc.page_texts(start, stop)
+    finally:
+        proc.close()
+    stats = ParseStats()
+    return list(parse_order_pages(texts, start=start, stats=stats)), stats
+
+
+def page_ranges(page_count: int, chunk_pages: int) -> list[tuple[int, int]]:
+    chunk_pages = max(1, chunk_pages)
+    return [(s, min(s + chunk_pages, page_count)) for s in range(0, page_count, chunk_pages)]
+
+
+def iter_parsed_chunks(pdf_path: str, page_count: int, chunk_pages: int | None = None,
+                       pdf_hash: str | None = None):
+    """Yield (results, stats) chunk by chunk, in page order, where results is a
+    list of (page_index, parsed_or_None) and stats the chunk's ParseStats."""
+    chunk_pages = chunk_pages or RUNTIME.parse_chunk_pages
+    ranges = page_ranges(page_count, chunk_pages)
+
+    # Small files (or parse_workers=1): not worth shipping to the pool
+    if _worker_count() <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            yield parse_page_range(pdf_path, start, stop, pdf_hash)
+        return
+
+    pool = _get_pool()
+    futures = [pool.submit(parse_page_range, pdf_path, start, stop, pdf_hash) for start, stop in ranges]
+    try:
+        for fut in futures:
+            yield fut.result()
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+
+def render_order_batch(specs: list[dict]) -> tuple[bytes | None, list[dict]]:
+    """Render a batch of orders. Runs inside a worker process.
+
+    Each spec has order_id, source_pdf, pdf_hash, page_index, out_pdf, labels and
+    invoices. Returns (merged PDF bytes of the orders that rendered, or None;
+    one {order_id, ok, out_pdf | error} per spec, in spec order)."""
+    slices = SliceCache()
+    merged = fitz.open()
+    results = []
+    try:
+        for spec in specs:
+            doc = fitz.open()
+            try:
+                slices.append_order_pages(doc, spec["source_pdf"], spec["pdf_hash"], spec["page_index"],
+                                          labels=spec["labels"], invoices=spec["invoices"])
+                doc.save(spec["out_pdf"], deflate=True)
+                merged.insert_pdf(doc)
+                results.append({"order_id": spec["order_id"], "ok": True, "out_pdf": spec["out_pdf"]})
+            except Exception as e:
+                results.append({"order_id": spec["order_id"], "ok": False, "error": str(e)})
+            finally:
+                doc.close()
+        data = merged.tobytes(deflate=True) if merged.page_count else None
+        return data, results
+    finally:
+        merged.close()
+
+
+def _failed_batch(batch: list[dict], error: Exception) -> tuple[None, list[dict]]:
+    return None, [{"order_id": spec["order_id"], "ok": False, "error": str(error)} for spec in batch]
+
+
+def iter_rendered_batches(specs: list[dict], batch_orders: int | None = None):
+    """Yield render_order_batch() results batch by batch, in spec order.
+    A batch whose worker died is yielded as a failure for each of its orders."""
+    batch_orders = max(1, batch_orders or RUNTIME.render_batch_orders)
+    batches = [specs[i:i + batch_orders] for i in range(0, len(specs), batch_orders)]
+
+    if _worker_count() <= 1 or len(batches) <= 1:
+        for batch in batches:
+            try:
+                yield render_order_batch(batch)
+            except Exception as e:
+                yield _failed_batch(batch, e)
+        return
+
+    pool = _get_pool()
+    futures = [(batch, pool.submit(render_order_batch, batch)) for batch in batches]
+    try:
+        for batch, fut in futures:
+            try:
+                yield fut.result()
+            except Exception as e:
+                yield _failed_batch(batch, e)
+    finally:
+        for _, fut in futures:
+            fut.cancel()
+
+
+def render_orders_merged(specs: list[dict], merged_pdf: str) -> list[dict]:
+    """Render every spec and stream the batches into one PDF at merged_pdf.
+
+    Returns the per-order results (see render_order_batch); nothing is
+    written when no order rendered."""
+    results = []
+    merged = fitz.open()
+    try:
+        for data, batch_results in iter_rendered_batches(specs):
+            results.extend(batch_results)
+            if data:
+                chunk = fitz.open("pdf", data)
+                try:
+                    merged.insert_pdf(chunk)
+                finally:
+                    chunk.close()
+
+        if merged.page_count:
+            tmp_path = merged_pdf + ".part"
+            merged.save(tmp_path, deflate=True)
+            os.replace(tmp_path, merged_pdf)
+        return results
+    finally:
+        merged.close()
@@ -0,0 +1,177 @@
+# printbatch.py
+# -----------------------------------------------
+# Rolling multi-order print batches.
+#
+# With RuntimeConfig.output_mode = "batch", completed orders are not
+# written to out/<order_id>.pdf. Their pages are appended to one open
+# in-memory fitz document, the current batch. When the batch reaches
+# batch_max_orders or has been open for batch_max_age_s, it is saved as
+# out/batches/<batch id>.pdf and a new one is started. The printer then
+# gets one larger job instead of dozens of tiny ones, and out/ stays
+# small.
+#
+# The open batch lives in memory, so it is also closed on exit. An order
+# records which batch and page range it landed in; /download rebuilds a
+# single order's PDF from the slice cache or the source on demand.
+#
+# An order is only "ready" once its batch file exists: app.py keeps it
+# "batched" until on_close reports the saved batch, and re-renders
+# "batched" orders without a batch file on the next start. A batch that
+# fails to save stays open and the save is retried every
+# SAVE_RETRY_S.
+# -----------------------------------------------
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from slicecache import SliceCache
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "out", "batches")
+SAVE_RETRY_S = 10.0
+
+
+class _OpenBatch:
+    def __init__(self, batch_id: str):
+        self.id = batch_id
+        self.doc = fitz.open()
+        self.order_ids: list[str] = []
+        self.opened_at = time.time()
+        self.retry_at = 0.0   # after a failed save, don't try again before this
+
+
+class PrintBatcher:
+    def __init__(self, slices: SliceCache, out_dir: str = DEFAULT_DIR,
+                 max_orders: int = 50, max_age_s: float = 300.0, on_close=None):
+        self.slices = slices
+        self.out_dir = out_dir
+        self.max_orders = max(1, max_orders)
+        self.max_age_s = max_age_s
+        # on_close(info) is called (outside the lock) with each saved batch's summary
+        self.on_close = on_close
+        self._lock = threading.Lock()
+        self._current: _OpenBatch | None = None
+        self._seq = 0
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._age_loop, name="print-batch", daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def add(self, order_id: str, source_pdf: str, pdf_hash: str | None, page_index: int,
+            labels: int = 1, invoices: int = 2) -> dict:
+        """Append one order's pages to the current batch. Returns
+        {batch_id, first_page, page_count} for the order record."""
+        closed = None
+        with self._lock:
+            batch = self._current or self._open()
+            first_page = batch.doc.page_count
+            try:
+                self.slices.append_order_pages(batch.doc, source_pdf, pdf_hash, page_index, labels, invoices)
+            except Exception:
+                # Keep the batch clean: drop whatever this order managed to append
+                if batch.doc.page_count > first_page:
+                    batch.doc.delete_pages(from_page=first_page, to_page=batch.doc.page_count - 1)
+                raise
+            batch.order_ids.append(order_id)
+            placed = {"batch_id": batch.id, "first_page": first_page,
+                      "page_count": batch.doc.page_count - first_page}
+            if len(batch.order_ids) >= self.max_orders and time.time() >= batch.retry_at:
+                # A failed save keeps the batch (with this order) open for a retry
+                closed = self._try_close()
+        self._notify(closed)
+        return placed
+
+    def rotate(self) -> dict | None:
+        """Close the current batch now (if it has any orders). Returns its summary."""
+        with self._lock:
+            closed = self._close_current()
+        self._notify(closed)
+        return closed
+
+    def is_saved(self, batch_id: str) -> bool:
+        return os.path.exists(self.path(batch_id))
+
+    def current(self) -> dict | None:
+        with self._lock:
+            batch = self._current
+            if batch is None:
+                return None
+            return {"batch_id": batch.id, "orders": len(batch.order_ids),
+                    "pages": batch.doc.page_count, "age_s": round(time.time() - batch.opened_at, 1)}
+
+    def path(self, batch_id: str) -> str:
+        return os.path.join(self.out_dir, f"{batch_id}.pdf")
+
+    def list_closed(self) -> list[str]:
+        if not os.path.isdir(self.out_dir):
+            return []
+        return sorted(f[:-4] for f in os.listdir(self.out_dir) if f.endswith(".pdf"))
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.rotate()
+        except Exception as e:
+            # Its orders stay "batched" and are re-rendered on the next start
+            print(f"[PRINT BATCH ERROR] not saved on exit: {e}")
+
+    def _open(self) -> _OpenBatch:
+        self._seq += 1
+        batch_id = f"batch-{datetime.now():%Y%m%d-%H%M%S}-{self._seq:04d}"
+        self._current = _OpenBatch(batch_id)
+        return self._current
+
+    def _close_current(self) -> dict | None:
+        """Save the current batch and start none. If the save fails the batch
+        stays current (nothing is lost) and the error propagates."""
+        batch = self._current
+        if batch is None:
+            return None
+        if not batch.order_ids:
+            self._current = None
+            batch.doc.close()
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = self.path(batch.id)
+        tmp_path = path + ".part"
+        try:
+            batch.doc.save(tmp_path, deflate=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            batch.retry_at = time.time() + SAVE_RETRY_S
+            raise
+        self._current = None
+        pages = batch.doc.page_count
+        batch.doc.close()
+        return {"batch_id": batch.id, "path": path, "order_ids": list(batch.order_ids), "pages": pages}
+
+    def _try_close(self) -> dict | None:
+        batch = self._current
+        try:
+            return self._close_current()
+        except Exception as e:
+            print(f"[PRINT BATCH ERROR] {batch.id} not saved, retrying in {SAVE_RETRY_S:.0f}s: {e}")
+            return None
+
+    def _notify(self, closed: dict | None):
+        if closed is not None and self.on_close is not None:
+            try:
+                self.on_close(closed)
+            except Exception as e:
+                print(f"[PRINT BATCH CALLBACK ERROR] {closed['batch_id']}: {e}")
+
+    def _age_loop(self):
+        while not self._stop.wait(1.0):
+            closed = None
+            with self._lock:
+                batch = self._current
+                now = time.time()
+                if (batch is not None and now >= batch.retry_at
+                        and (now - batch.opened_at >= self.max_age_s
+                             or len(batch.order_ids) >= self.max_orders)):
+                    closed = self._try_close()
+            self._notify(closed)
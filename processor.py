@@ -1,9 +1,13 @@
 # processor.py — project 2 (config-driven)
 
-import io
+import hashlib
+import json
+from dataclasses import asdict
+
 import fitz  # PyMuPDF
-import PyPDF2
 from config import DEFAULT as CFG  # ← uses the new config with page_width_pt / page_height_pt
+from config import RUNTIME
+from docpool import POOL
 
 # ---------------------------------------------------------
 # Fixed output page size (ALL pages will use this size)
@@ -11,16 +15,74 @@ from config import DEFAULT as CFG  # ← uses the new config with page_width_pt
 PAGE_W_PT = CFG.page_width_pt
 PAGE_H_PT = CFG.page_height_pt
 
+TEXT_MODES = ("full", "clipped")
+
+def text_settings_key(mode: str, cfg=CFG) -> str:
+    """Cache key for page_text() output; bump the version when extraction changes."""
+    if mode == "clipped":
+        return f"clip-v2:{cfg.text_label_from_frac}:{cfg.text_invoice_to_frac}"
+    return "text-v1"
+
+def _compute_text_clip(page_rect: fitz.Rect, cfg=CFG) -> fitz.Rect:
+    """One full-width band from the label top to the end of the invoice lines. The
+    fields sit in both halves around split_frac, so two bands would always touch."""
+    h = page_rect.height
+    return fitz.Rect(page_rect.x0, page_rect.y0 + h * cfg.text_label_from_frac,
+                     page_rect.x1, page_rect.y0 + h * cfg.text_invoice_to_frac)
+
 class PDFOrderProcessor:
-    def __init__(self, pdf_path: str):
+    """Page text access for one manifest. The fitz document itself comes from the
+    shared DocumentPool, so several processors (and the slicer) reuse one open copy."""
+
+    def __init__(self, pdf_path: str, pdf_hash: str | None = None, text_cache=None,
+                 text_mode: str | None = None):
         self.pdf_path = pdf_path
-        self.doc = fitz.open(pdf_path)
+        # Optional textcache.PageTextCache; only used when we know the file's hash
+        self.pdf_hash = pdf_hash
+        self.text_cache = text_cache if pdf_hash else None
+        self.text_mode = text_mode or RUNTIME.text_mode
+        if self.text_mode not in TEXT_MODES:
+            raise ValueError(f"text_mode must be one of {TEXT_MODES}, got {self.text_mode!r}")
+        self.text_settings = text_settings_key(self.text_mode)
 
     def doc_page_count(self) -> int:
-        return self.doc.page_count
+        with POOL.document(self.pdf_path) as doc:
+            return doc.page_count
+
+    def _extract_text(self, doc: fitz.Document, page_index: int) -> str:
+        page = doc.load_page(page_index)
+        if self.text_mode == "full":
+            return page.get_text('text')
+        # Only the band that holds order id / name / invoice / date / SKU lines
+        return page.get_text('text', clip=_compute_text_clip(page.rect))
 
     def page_text(self, page_index: int) -> str:
-        return self.doc.load_page(page_index).get_text('text')
+        if self.text_cache is not None:
+            text = self.text_cache.get(self.pdf_hash, page_index, self.text_settings)
+            if text is not None:
+                return text
+        with POOL.document(self.pdf_path) as doc:
+            text = self._extract_text(doc, page_index)
+        if self.text_cache is not None:
+            self.text_cache.put(self.pdf_hash, page_index, self.text_settings, text)
+        return text
+
+    def page_texts(self, start: int, stop: int) -> list[str]:
+        """Text of pages [start, stop), with one cache read and one cache write for the range."""
+        cached = {}
+        if self.text_cache is not None:
+            cached = self.text_cache.get_range(self.pdf_hash, start, stop, self.text_settings)
+        missing = [i for i in range(start, stop) if i not in cached]
+        fresh = {}
+        if missing:
+            with POOL.document(self.pdf_path) as doc:
+                fresh = {i: self._extract_text(doc, i) for i in missing}
+        if self.text_cache is not None:
+            self.text_cache.put_many(self.pdf_hash, self.text_settings, fresh)
+        return [cached[i] if i in cached else fresh[i] for i in range(start, stop)]
+
+    def close(self):
+        """Nothing to release: the document stays in the pool for the next user."""
 
 def _compute_label_invoice_rects(page_rect: fitz.Rect, cfg=CFG) -> tuple[fitz.Rect, fitz.Rect]:
     y_split = page_rect.y0 + page_rect.height * cfg.split_frac
@@ -47,7 +109,8 @@ def _compute_label_invoice_rects(page_rect: fitz.Rect, cfg=CFG) -> tuple[fitz.Re
     invoice = invoice & page_rect
     return label, invoice
 
-def _render_clip_to_fixed_page(src_doc: fitz.Document, page_index: int, clip_rect: fitz.Rect) -> fitz.Document:
+def _label_dest_rect(clip_rect: fitz.Rect) -> fitz.Rect:
+    """Where the label clip lands on the fixed-size output page."""
     clip_w, clip_h = clip_rect.width, clip_rect.height
     scale = min(PAGE_W_PT / clip_w, PAGE_H_PT / clip_h)
     
@@ -58,14 +121,10 @@ def _render_clip_to_fixed_page(src_doc: fitz.Document, page_index: int, clip_rec
     dest_h = clip_h * scale
     dx = (PAGE_W_PT - dest_w) / 2.0
     dy = (PAGE_H_PT - dest_h) / 2.0
+    return fitz.Rect(dx, dy, dx + dest_w, dy + dest_h)
 
-    out = fitz.open()
-    p = out.new_page(width=PAGE_W_PT, height=PAGE_H_PT)
-    dest = fitz.Rect(dx, dy, dx + dest_w, dy + dest_h)
-    p.show_pdf_page(dest, src_doc, page_index, clip=clip_rect, rotate=0, keep_proportion=True, overlay=True, oc=0)
-    return out
-
-def _render_rotated_clip_to_fixed_page(src_doc: fitz.Document, page_index: int, clip_rect: fitz.Rect, rotation_deg: int) -> fitz.Document:
+def _invoice_dest_rect(clip_rect: fitz.Rect, rotation_deg: int) -> fitz.Rect:
+    """Where the (rotated) invoice clip lands on the fixed-size output page."""
     clip_w, clip_h = clip_rect.width, clip_rect.height
     if rotation_deg % 180 == 90:
         content_w, content_h = clip_h, clip_w
@@ -77,42 +136,74 @@ def _render_rotated_clip_to_fixed_page(src_doc: fitz.Document, page_index: int,
     dest_h = content_h * scale
     dx = (PAGE_W_PT - dest_w) / 2.0
     dy = (PAGE_H_PT - dest_h) / 2.0
+    return fitz.Rect(dx, dy, dx + dest_w, dy + dest_h)
 
-    out = fitz.open()
-    p = out.new_page(width=PAGE_W_PT, height=PAGE_H_PT)
-    dest = fitz.Rect(dx, dy, dx + dest_w, dy + dest_h)
-    p.show_pdf_page(dest, src_doc, page_index, clip=clip_rect, rotate=rotation_deg, keep_proportion=True, overlay=True, oc=0)
-    return out
+def render_order_pages(out: fitz.Document, src: fitz.Document, page_index: int,
+                       labels: int = 1, invoices: int = 2):
+    """Append `labels` label pages then `invoices` invoice pages for one order to `out`.
 
-# processor.py
-
-def slice_and_build_order_pdf(source_pdf: str, page_index: int, out_pdf: str,
-                              labels: int = 1, invoices: int = 2):
-    src = fitz.open(source_pdf)
+    Every copy is a show_pdf_page() of the same source page, which PyMuPDF stores
+    once per output document as a Form XObject; extra copies only add a page and
+    a tiny content stream referencing it."""
     page = src.load_page(page_index)
-    page_rect = page.rect
-
-    label_clip, invoice_clip = _compute_label_invoice_rects(page_rect, cfg=CFG)
+    label_clip, invoice_clip = _compute_label_invoice_rects(page.rect, cfg=CFG)
+    label_dest = _label_dest_rect(label_clip)
+    invoice_dest = _invoice_dest_rect(invoice_clip, CFG.rotate_invoice_deg)
 
     # Page(s): label
-    label_doc = _render_clip_to_fixed_page(src, page_index, label_clip)
-
-    # Page(s): invoice
-    inv_doc = _render_rotated_clip_to_fixed_page(
-        src, page_index, invoice_clip, rotation_deg=CFG.rotate_invoice_deg
-    )
-
-    writer = PyPDF2.PdfWriter()
-    label_reader = PyPDF2.PdfReader(io.BytesIO(label_doc.tobytes()))
-    inv_reader = PyPDF2.PdfReader(io.BytesIO(inv_doc.tobytes()))
-
-    # Add label pages
     for _ in range(max(0, int(labels))):
-        writer.add_page(label_reader.pages[0])
+        p = out.new_page(width=PAGE_W_PT, height=PAGE_H_PT)
+        p.show_pdf_page(label_dest, src, page_index, clip=label_clip, rotate=0,
+                        keep_proportion=True, overlay=True, oc=0)
 
-    # Add invoice pages
+    # Page(s): invoice
     for _ in range(max(0, int(invoices))):
-        writer.add_page(inv_reader.pages[0])
+        p = out.new_page(width=PAGE_W_PT, height=PAGE_H_PT)
+        p.show_pdf_page(invoice_dest, src, page_index, clip=invoice_clip, rotate=CFG.rotate_invoice_deg,
+                        keep_proportion=True, overlay=True, oc=0)
+
+def slice_settings_key(cfg=CFG) -> str:
+    """Cache key for rendered slices: every SplitConfig field that affects the output pages."""
+    geometry = {k: v for k, v in asdict(cfg).items() if not k.startswith("text_")}
+    digest = hashlib.sha1(json.dumps(geometry, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"slice-v1-{digest[:12]}"
+
+def render_slice_pieces(source_pdf: str, page_index: int) -> bytes:
+    """One label page + one invoice page for this manifest page, as PDF bytes."""
+    with POOL.document(source_pdf) as src:
+        out = fitz.open()
+        try:
+            render_order_pages(out, src, page_index, labels=1, invoices=1)
+            return out.tobytes(deflate=True)
+        finally:
+            out.close()
+
+def append_pieces(out: fitz.Document, pieces_pdf: str, labels: int = 1, invoices: int = 2):
+    """Append an order's pages from pre-rendered pieces (see render_slice_pieces) without touching the source.
+
+    Like render_order_pages(), copies are show_pdf_page() of one piece page, so each
+    piece is stored once as a Form XObject (insert_pdf would copy it per page)."""
+    pieces = fitz.open(pieces_pdf)
+    try:
+        for piece_index, copies in ((0, labels), (1, invoices)):
+            rect = pieces[piece_index].rect
+            for _ in range(max(0, int(copies))):
+                p = out.new_page(width=rect.width, height=rect.height)
+                p.show_pdf_page(p.rect, pieces, piece_index, overlay=True, oc=0)
+    finally:
+        pieces.close()
+
+def append_sliced_pages(out: fitz.Document, source_pdf: str, page_index: int,
+                        labels: int = 1, invoices: int = 2):
+    """render_order_pages() straight from the source manifest (via the document pool)."""
+    with POOL.document(source_pdf) as src:
+        render_order_pages(out, src, page_index, labels, invoices)
 
-    with open(out_pdf, "wb") as f:
-        writer.write(f)
+def slice_and_build_order_pdf(source_pdf: str, page_index: int, out_pdf: str,
+                              labels: int = 1, invoices: int = 2):
+    out = fitz.open()
+    try:
+        append_sliced_pages(out, source_pdf, page_index, labels, invoices)
+        out.save(out_pdf, deflate=True)
+    finally:
+        out.close()
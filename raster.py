@@ -0,0 +1,135 @@
+# raster.py
+# -----------------------------------------------
+# 1-bit raster output for thermal printers.
+#
+# Our label printers are 203-dpi thermal printers that rasterize every PDF
+# they get. This renders an order's label and invoice pages (the same
+# layout the PDF slicer produces, at SplitConfig page size) straight to
+# black/white bitmaps:
+#
+#   png  8-bit grayscale PNG holding only 0/255 (any viewer / driver)
+#   pbm  binary PBM (P4), 1 bit per dot
+#   zpl  one ^GF graphic field per label (ASCII hex), ready for a Zebra
+#
+# One label page and one invoice page are kept per order in
+#   out/cache/raster/<order_id>/<kind>-<settings>.<fmt>
+# where settings covers the source hash, slice geometry, dpi and threshold.
+# Copies (print_rules.csv) are left to the print host / spooler.
+#
+# numpy is only needed here and only imported on the first render, so the
+# app itself still starts without it.
+# -----------------------------------------------
+
+import os
+import tempfile
+from typing import TYPE_CHECKING
+
+import fitz  # PyMuPDF
+
+from config import RUNTIME
+from slicecache import SliceCache
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "out", "cache", "raster")
+
+KINDS = ("label", "invoice")
+FORMATS = ("png", "pbm", "zpl")
+MIMETYPES = {"png": "image/png", "pbm": "image/x-portable-bitmap", "zpl": "text/plain"}
+# Accepted ?dpi= / ?threshold=; bitmap size (and cache files) grow with every distinct value
+DPI_RANGE = (72, 600)
+THRESHOLD_RANGE = (0, 255)
+
+
+def check_settings(dpi: int, threshold: int):
+    """Raise ValueError when dpi or threshold is outside DPI_RANGE / THRESHOLD_RANGE."""
+    if not DPI_RANGE[0] <= dpi <= DPI_RANGE[1]:
+        raise ValueError(f"dpi must be between {DPI_RANGE[0]} and {DPI_RANGE[1]}, got {dpi}")
+    if not THRESHOLD_RANGE[0] <= threshold <= THRESHOLD_RANGE[1]:
+        raise ValueError(f"threshold must be between {THRESHOLD_RANGE[0]} and {THRESHOLD_RANGE[1]}, got {threshold}")
+
+
+def page_bitmap(page: fitz.Page, dpi: int, threshold: int = 128) -> "np.ndarray":
+    """Render one page to a (height, width) bool array, True = black dot."""
+    import numpy as np
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    return gray < threshold
+
+
+def encode_png(black: "np.ndarray") -> bytes:
+    import numpy as np
+    h, w = black.shape
+    gray = np.where(black, 0, 255).astype(np.uint8)
+    return fitz.Pixmap(fitz.csGRAY, w, h, gray.tobytes(), False).tobytes("png")
+
+
+def encode_pbm(black: "np.ndarray") -> bytes:
+    import numpy as np
+    h, w = black.shape
+    # P4 rows are padded to whole bytes, MSB first, 1 = black: exactly np.packbits
+    return b"P4\n%d %d\n" % (w, h) + np.packbits(black, axis=1).tobytes()
+
+
+def encode_zpl(black: "np.ndarray") -> bytes:
+    import numpy as np
+    h, w = black.shape
+    rows = np.packbits(black, axis=1)
+    bytes_per_row = rows.shape[1]
+    total = rows.size
+    data = rows.tobytes().hex().upper()
+    return (f"^XA^PW{w}^LL{h}^FO0,0^GFA,{total},{total},{bytes_per_row},{data}^FS^XZ\n").encode("ascii")
+
+
+ENCODERS = {"png": encode_png, "pbm": encode_pbm, "zpl": encode_zpl}
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RasterCache:
+    def __init__(self, slices: SliceCache, root: str = DEFAULT_DIR):
+        self.slices = slices
+        self.root = root
+
+    def path(self, o: dict, kind: str, fmt: str, dpi: int, threshold: int) -> str:
+        source = (o.get("pdf_hash") or "nohash")[:12]
+        settings = f"{source}-p{o['page_index']}-{self.slices.settings}-{dpi}dpi-t{threshold}"
+        return os.path.join(self.root, o["order_id"], f"{kind}-{settings}.{fmt}")
+
+    def get(self, o: dict, kind: str, fmt: str, dpi: int | None = None,
+            threshold: int | None = None) -> str:
+        """Path of the order's `kind` page in `fmt`, rendering label and invoice on a miss."""
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}, got {fmt!r}")
+        dpi = dpi or RUNTIME.raster_dpi
+        threshold = RUNTIME.raster_threshold if threshold is None else threshold
+        check_settings(dpi, threshold)
+
+        path = self.path(o, kind, fmt, dpi, threshold)
+        if os.path.exists(path):
+            return path
+
+        # One label page + one invoice page, laid out exactly like the PDF output
+        pieces = fitz.open("pdf", self.slices.order_pdf_bytes(
+            o["pdf_path"], o.get("pdf_hash"), o["page_index"], labels=1, invoices=1))
+        try:
+            for page_kind, page in zip(KINDS, pieces):
+                black = page_bitmap(page, dpi, threshold)
+                _write_atomic(self.path(o, page_kind, fmt, dpi, threshold), ENCODERS[fmt](black))
+        finally:
+            pieces.close()
+        return path
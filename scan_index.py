@@ -0,0 +1,81 @@
+# scan_index.py
+# -----------------------------------------------
+# SKU -> pending line-item index.
+#
+# A scan used to walk every order and every item looking for the first
+# pending line of the scanned SKU that still has room. This keeps, per
+# SKU, a FIFO queue of (order_id) entries whose line still needs units,
+# so /scan resolves its target without looking at unrelated orders.
+#
+# Entries are invalidated lazily: each live (order_id, sku) key maps to
+# a token, and queue entries whose token no longer matches are dropped
+# when they reach the front. Re-adding a key (e.g. qty grew on a merge)
+# issues a new token, so a stale copy further up the queue is ignored.
+#
+# Not locked on its own: app.py only touches it while holding
+# STORE.transaction(), which already serializes writers.
+# -----------------------------------------------
+
+from collections import deque
+from itertools import count
+
+
+def line_needs_units(order: dict, item: dict) -> bool:
+    """A line still takes scans while its order is pending and it isn't full."""
+    if order.get("status") != "pending":
+        return False
+    return len(item.get("product_ids") or []) < int(item["qty"])
+
+
+class PendingIndex:
+    def __init__(self):
+        self._queues: dict[str, deque] = {}
+        self._live: dict[tuple[str, str], int] = {}
+        self._tokens = count(1)
+
+    def build(self, orders):
+        """Rebuild from scratch (orders in FIFO order, e.g. STORE.by_status('pending'))."""
+        self._queues.clear()
+        self._live.clear()
+        for o in orders:
+            self.track(o)
+
+    def track(self, order: dict):
+        """Sync the index with the current state of one order.
+
+        Call after every upload merge, scan, bulk print or status change."""
+        order_id = order["order_id"]
+        for it in order.get("items", []):
+            key = (order_id, it["sku"].upper())
+            if line_needs_units(order, it):
+                if key not in self._live:
+                    token = next(self._tokens)
+                    self._live[key] = token
+                    self._queues.setdefault(key[1], deque()).append((order_id, token))
+            else:
+                self._live.pop(key, None)
+
+    def forget(self, order_id: str, skus):
+        for sku in skus:
+            self._live.pop((order_id, sku.upper()), None)
+
+    def candidates(self, sku: str):
+        """Yield order_ids with a pending, not-full line for `sku`, oldest first.
+
+        Safe to call track() on yielded orders while iterating."""
+        sku = sku.upper()
+        q = self._queues.get(sku)
+        if not q:
+            return
+        i = 0
+        while i < len(q):
+            order_id, token = q[i]
+            if self._live.get((order_id, sku)) != token:
+                if i == 0:
+                    q.popleft()  # stale head: drop it for good
+                else:
+                    i += 1
+                continue
+            yield order_id
+            i += 1
+
@@ -0,0 +1,105 @@
+# slicecache.py
+# -----------------------------------------------
+# Pre-rendered label/invoice slices.
+#
+# Building an order PDF used to happen only when the last scan completed
+# the order, so the packer waited on rendering. With
+# RuntimeConfig.prerender_slices on, every page of a freshly parsed
+# manifest is rendered in the background into a two-page "pieces" PDF
+# (label, invoice):
+#
+#   out/cache/slices/<pdf sha256>/<page>-<slice settings key>.pdf
+#
+# Completing an order then only copies those pages the number of times
+# print_rules.csv asks for. The settings key hashes the SplitConfig
+# geometry, so changing the crop just misses the cache. Orders whose
+# pieces are not (yet) cached render from the source as before.
+# -----------------------------------------------
+
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+
+from processor import (
+    append_pieces,
+    append_sliced_pages,
+    render_slice_pieces,
+    slice_settings_key,
+)
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "out", "cache", "slices")
+
+
+class SliceCache:
+    def __init__(self, root: str = DEFAULT_DIR):
+        self.root = root
+        self.settings = slice_settings_key()
+
+    def path(self, pdf_hash: str, page_index: int) -> str:
+        return os.path.join(self.root, pdf_hash, f"{page_index}-{self.settings}.pdf")
+
+    def get(self, pdf_hash: str | None, page_index: int) -> str | None:
+        if not pdf_hash:
+            return None
+        path = self.path(pdf_hash, page_index)
+        return path if os.path.exists(path) else None
+
+    def ensure(self, source_pdf: str, pdf_hash: str, page_index: int) -> bool:
+        """Render the pieces for one page unless cached. Returns True if it rendered."""
+        path = self.path(pdf_hash, page_index)
+        if os.path.exists(path):
+            return False
+        data = render_slice_pieces(source_pdf, page_index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # temp file + rename: a reader never sees half a PDF
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def append_order_pages(self, out: fitz.Document, source_pdf: str, pdf_hash: str | None,
+                           page_index: int, labels: int = 1, invoices: int = 2) -> bool:
+        """Append one order's pages to `out`, from cached pieces when available.
+        Returns True on a cache hit."""
+        pieces = self.get(pdf_hash, page_index)
+        if pieces is not None:
+            start = out.page_count
+            try:
+                append_pieces(out, pieces, labels=labels, invoices=invoices)
+                return True
+            except Exception as e:
+                # Damaged cache entry: drop it and render from the source instead
+                print(f"[SLICE CACHE] {pieces}: {e}")
+                if out.page_count > start:
+                    out.delete_pages(from_page=start, to_page=out.page_count - 1)
+                os.remove(pieces)
+        append_sliced_pages(out, source_pdf, page_index, labels=labels, invoices=invoices)
+        return False
+
+    def build_order_pdf(self, source_pdf: str, pdf_hash: str | None, page_index: int,
+                        out_pdf: str, labels: int = 1, invoices: int = 2) -> bool:
+        """Write one order PDF (see append_order_pages). Returns True on a cache hit."""
+        out = fitz.open()
+        try:
+            hit = self.append_order_pages(out, source_pdf, pdf_hash, page_index, labels, invoices)
+            out.save(out_pdf, deflate=True)
+            return hit
+        finally:
+            out.close()
+
+    def order_pdf_bytes(self, source_pdf: str, pdf_hash: str | None, page_index: int,
+                        labels: int = 1, invoices: int = 2) -> bytes:
+        """One order's PDF in memory (for orders printed as part of a batch)."""
+        out = fitz.open()
+        try:
+            self.append_order_pages(out, source_pdf, pdf_hash, page_index, labels, invoices)
+            return out.tobytes(deflate=True)
+        finally:
+            out.close()
@@ -0,0 +1,223 @@
+# spooler.py
+# -----------------------------------------------
+# Local print queue.
+#
+# Completed orders (a /scan that finishes an order, a /bulk_print file, a
+# closed print batch) are enqueued here instead of being printed inside the
+# request. One worker thread hands them to a sink strictly in queue order:
+#
+#   directory  copy the file into a drop folder watched by the print host
+#   command    run a local command, e.g. 'PDFtoPrinter.exe "{path}"'
+#   stub       just log the job (wiring tests, no printer attached)
+#
+# A failing job is retried with exponential backoff and holds back the jobs
+# behind it, so labels never come out of order; after max_attempts it is
+# marked failed (POST /print_queue/<id>/retry puts it back) and the queue
+# moves on. Jobs live in out/spool.sqlite3, so a restart resumes the queue.
+# -----------------------------------------------
+
+import os
+import shlex
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "out", "spool.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS print_jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    ref         TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'queued',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    next_at     REAL NOT NULL DEFAULT 0,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON print_jobs(status, id);
+"""
+
+_COLUMNS = ("id", "ref", "path", "status", "attempts", "next_at", "error", "created_at", "finished_at")
+
+
+class DirectorySink:
+    """Copy each file into `directory` as <job id>-<file name> (temp name + rename)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def send(self, job: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        target = os.path.join(self.directory, f"{job['id']:06d}-{os.path.basename(job['path'])}")
+        tmp_path = target + ".part"
+        shutil.copyfile(job["path"], tmp_path)
+        os.replace(tmp_path, target)
+
+
+def _split_command(command: str) -> list[str]:
+    if os.name != "nt":
+        return shlex.split(command)
+    # Non-POSIX mode keeps the quotes around a token ('"{path}"'); strip them, or
+    # subprocess would quote them again and the tool would get a path with literal quotes
+    args = []
+    for token in shlex.split(command, posix=False):
+        if len(token) >= 2 and token[0] == token[-1] and token[0] in "\"'":
+            token = token[1:-1]
+        args.append(token)
+    return args
+
+
+class CommandSink:
+    """Run `command` with {path} replaced by the file; a non-zero exit is a failure."""
+
+    def __init__(self, command: str, timeout_s: float = 120.0):
+        self.command = command
+        self.timeout_s = timeout_s
+
+    def send(self, job: dict):
+        if not os.path.exists(job["path"]):
+            raise FileNotFoundError(job["path"])
+        args = [a.replace("{path}", job["path"]) for a in _split_command(self.command)]
+        proc = subprocess.run(args, capture_output=True, text=True, timeout=self.timeout_s)
+        if proc.returncode != 0:
+            raise RuntimeError(f"exit {proc.returncode}: {(proc.stderr or proc.stdout).strip()[:500]}")
+
+
+class StubSink:
+    def send(self, job: dict):
+        print(f"[SPOOL STUB] job {job['id']} {job['ref']}: {job['path']}")
+
+
+def make_sink(kind: str, directory: str = "", command: str = ""):
+    if kind == "directory":
+        return DirectorySink(directory)
+    if kind == "command":
+        if not command:
+            raise ValueError("spool_sink='command' needs RuntimeConfig.spool_command")
+        return CommandSink(command)
+    if kind == "stub":
+        return StubSink()
+    raise ValueError(f"Unknown spool sink {kind!r} (expected directory, command or stub)")
+
+
+class PrintSpooler:
+    def __init__(self, sink, path: str = DEFAULT_PATH, max_attempts: int = 5,
+                 retry_base_s: float = 5.0, on_change=None):
+        self.sink = sink
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_s = retry_base_s
+        # on_change(job dict) after every status change (called from the worker thread)
+        self.on_change = on_change
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._cond = threading.Condition()
+        with self._cond, self._conn:
+            # A job that was being printed when the app stopped goes out again
+            self._conn.execute("UPDATE print_jobs SET status = 'queued' WHERE status = 'printing'")
+        self._stop = False
+        self._worker: threading.Thread | None = None
+
+    def start(self):
+        """Start the worker thread (once). enqueue() starts it too; call this at app start
+        to resume a queue left over from the last run."""
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="print-spooler", daemon=True)
+                self._worker.start()
+
+    def enqueue(self, ref: str, path: str) -> int:
+        self.start()
+        with self._cond:
+            with self._conn:
+                cur = self._conn.execute(
+                    "INSERT INTO print_jobs (ref, path, created_at) VALUES (?, ?, ?)",
+                    (ref, path, time.time()),
+                )
+            self._cond.notify()
+        return cur.lastrowid
+
+    def retry(self, job_id: int) -> bool:
+        """Put a failed job back in the queue (at its original position)."""
+        with self._cond:
+            with self._conn:
+                cur = self._conn.execute(
+                    "UPDATE print_jobs SET status = 'queued', attempts = 0, next_at = 0, error = NULL "
+                    "WHERE id = ? AND status = 'failed'",
+                    (job_id,),
+                )
+            self._cond.notify()
+        return cur.rowcount > 0
+
+    def depth(self) -> dict:
+        with self._cond:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM print_jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "printing": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def jobs(self, status: str | None = None, limit: int = 50) -> list[dict]:
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM print_jobs"
+        args: tuple = ()
+        if status:
+            sql += " WHERE status = ?"
+            args = (status,)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._cond:
+            rows = self._conn.execute(sql, args + (limit,)).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def _head(self) -> dict | None:
+        row = self._conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM print_jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def _set(self, job: dict, **fields):
+        job.update(fields)
+        with self._cond, self._conn:
+            self._conn.execute(
+                f"UPDATE print_jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                (*fields.values(), job["id"]),
+            )
+        if self.on_change is not None:
+            try:
+                self.on_change(dict(job))
+            except Exception as e:
+                print(f"[SPOOL CALLBACK ERROR] job {job['id']}: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stop:
+                        return
+                    job = self._head()
+                    wait = None if job is None else job["next_at"] - time.time()
+                    if job is not None and wait <= 0:
+                        break
+                    # Empty queue, or the head is backing off: later jobs wait behind it
+                    self._cond.wait(timeout=wait)
+
+            self._set(job, status="printing", attempts=job["attempts"] + 1)
+            try:
+                self.sink.send(job)
+            except Exception as e:
+                print(f"[SPOOL ERROR] job {job['id']} {job['ref']} (attempt {job['attempts']}): {e}")
+                if job["attempts"] >= self.max_attempts:
+                    self._set(job, status="failed", error=str(e), finished_at=time.time())
+                else:
+                    backoff = self.retry_base_s * 2 ** (job["attempts"] - 1)
+                    self._set(job, status="queued", error=str(e), next_at=time.time() + backoff)
+                continue
+            self._set(job, status="done", error=None, finished_at=time.time())
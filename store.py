@@ -0,0 +1,388 @@
+# store.py
+# -----------------------------------------------
+# Order storage backends.
+#
+# The app used to keep every order in out/orders.json and rewrite the
+# whole file on each request. Orders now live behind a small backend
+# interface so a scan only touches the rows it changes.
+#
+#   OrderStore        -> interface used by app.py
+#   SQLiteOrderStore  -> default backend (WAL mode, keyed by order_id,
+#                        indexed on status and sku)
+#
+# Every scanned unit (sku, product_id) is also indexed to the order that
+# holds it, so a unit can never be scanned into two orders. Synthetic
+# tokens for Loose/bulk units (SCAN-..., BULK-...) are not units.
+#
+# Orders keep the same dict shape as the old JSON file:
+#   {order_id, invoice_number, customer_name, date, page_index,
+#    pdf_path, status, items: [{sku, qty, product_ids}], ...}
+# -----------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class OrderStore:
+    """Interface every storage backend implements."""
+
+    def get(self, order_id: str) -> dict | None:
+        raise NotImplementedError
+
+    def all(self) -> list[dict]:
+        """Every order, in the order it was first stored."""
+        raise NotImplementedError
+
+    def by_status(self, status: str) -> list[dict]:
+        raise NotImplementedError
+
+    def with_sku(self, sku: str, status: str | None = None) -> list[dict]:
+        """Orders holding a line item for `sku` (optionally filtered by status)."""
+        raise NotImplementedError
+
+    def put(self, order: dict) -> int:
+        """Insert or replace one order. Returns the store version it was written at."""
+        raise NotImplementedError
+
+    def put_many(self, orders):
+        with self.transaction():
+            for o in orders:
+                self.put(o)
+
+    def changed_since(self, version: int, limit: int | None = None) -> list[tuple[int, int, dict]]:
+        """(seq, version, order) for orders written after `version`, oldest change first."""
+        raise NotImplementedError
+
+    def page(self, status: str | None = None, limit: int | None = None,
+             offset: int = 0, after_seq: int | None = None) -> list[tuple[int, int, dict]]:
+        """(seq, version, order) in storage order. Use `after_seq` (keyset) or `offset`."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def version(self) -> int:
+        """Monotonic counter bumped by every put(); lets clients ask 'what changed?'."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop every order, and the upload records that point at them (so
+        re-uploading a manifest parses it again)."""
+        raise NotImplementedError
+
+    def get_upload(self, sha256: str) -> dict | None:
+        """Record of a fully parsed upload (see record_upload), or None."""
+        raise NotImplementedError
+
+    def record_upload(self, sha256: str, info: dict):
+        """Remember that the PDF with this hash was parsed (path, pages, order_ids...)."""
+        raise NotImplementedError
+
+    def unit_owner(self, sku: str, product_id: str) -> str | None:
+        """order_id holding this scanned unit, or None."""
+        raise NotImplementedError
+
+    def find_units(self, product_id: str, sku: str | None = None) -> list[tuple[str, str, str]]:
+        """(sku, product_id, order_id) for a product id, across SKUs unless `sku` is given."""
+        raise NotImplementedError
+
+    def transaction(self):
+        """Context manager grouping reads and writes so they commit (or roll back) together."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # ---------- migration ----------
+
+    def import_json(self, json_path: str) -> int:
+        """One-time import of a legacy orders.json. Only runs into an empty store."""
+        if not os.path.exists(json_path) or self.count() > 0:
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            orders = json.load(f).get("orders", [])
+        self.put_many(orders)
+        return len(orders)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    status   TEXT NOT NULL,
+    data     TEXT NOT NULL,
+    version  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL,
+    sku      TEXT NOT NULL,
+    PRIMARY KEY (order_id, sku)
+);
+CREATE INDEX IF NOT EXISTS idx_order_items_sku ON order_items(sku);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+
+CREATE TABLE IF NOT EXISTS units (
+    sku        TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    order_id   TEXT NOT NULL,
+    PRIMARY KEY (sku, product_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_units_order ON units(order_id);
+CREATE INDEX IF NOT EXISTS idx_units_product ON units(product_id);
+
+CREATE TABLE IF NOT EXISTS uploads (
+    sha256     TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+# Columns added after the first release; applied to older databases on open.
+# (table, column, [statements run once when the column is missing])
+_MIGRATIONS = [
+    ("orders", "version", [
+        "ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+        # existing rows must be visible to a since=0 change feed
+        "UPDATE orders SET version = seq",
+        "UPDATE meta SET value = (SELECT COALESCE(MAX(seq), 0) FROM orders) WHERE key = 'version'",
+    ]),
+]
+
+# Indexes on migrated columns; created after _MIGRATIONS so old files have the column.
+_POST_MIGRATION = """
+CREATE INDEX IF NOT EXISTS idx_orders_version ON orders(version);
+"""
+
+# product_ids with these prefixes are generated tokens, not scanned units
+SYNTHETIC_UNIT_PREFIXES = ("SCAN-", "BULK-")
+
+
+def _order_units(order: dict) -> list[tuple[str, str]]:
+    units = []
+    for it in order.get("items", []):
+        sku = (it.get("sku") or "").upper()
+        for pid in it.get("product_ids") or ():
+            if sku and pid and not pid.startswith(SYNTHETIC_UNIT_PREFIXES):
+                units.append((sku, pid))
+    return units
+
+
+class SQLiteOrderStore(OrderStore):
+    """SQLite backend. One shared connection guarded by a re-entrant lock,
+    so a read-modify-write inside `transaction()` is atomic across Flask
+    request threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._depth = 0
+        # isolation_level=None -> autocommit; we issue BEGIN ourselves
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        for table, column, statements in _MIGRATIONS:
+            cols = {r[1] for r in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in cols:
+                with self.transaction():
+                    for sql in statements:
+                        self._conn.execute(sql)
+        self._conn.executescript(_POST_MIGRATION)
+
+        # Unit index added later: fill it once from the orders already stored
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'units_indexed'").fetchone() is None:
+            with self.transaction():
+                for (data,) in self._conn.execute("SELECT data FROM orders ORDER BY seq").fetchall():
+                    order = json.loads(data)
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO units (sku, product_id, order_id) VALUES (?, ?, ?)",
+                        [(sku, pid, order["order_id"]) for sku, pid in _order_units(order)],
+                    )
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('units_indexed', 1)")
+
+    # ---------- reads ----------
+
+    def get(self, order_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM orders ORDER BY seq").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def by_status(self, status: str) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM orders WHERE status = ? ORDER BY seq", (status,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def with_sku(self, sku: str, status: str | None = None) -> list[dict]:
+        sql = ("SELECT o.data FROM order_items i JOIN orders o ON o.order_id = i.order_id "
+               "WHERE i.sku = ?")
+        args = [sku.upper()]
+        if status is not None:
+            sql += " AND o.status = ?"
+            args.append(status)
+        sql += " ORDER BY o.seq"
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def changed_since(self, version: int, limit: int | None = None) -> list[tuple[int, int, dict]]:
+        sql = "SELECT seq, version, data FROM orders WHERE version > ? ORDER BY version"
+        args = [version]
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [(seq, ver, json.loads(data)) for seq, ver, data in rows]
+
+    def page(self, status: str | None = None, limit: int | None = None,
+             offset: int = 0, after_seq: int | None = None) -> list[tuple[int, int, dict]]:
+        where, args = [], []
+        if status is not None:
+            where.append("status = ?")
+            args.append(status)
+        if after_seq is not None:
+            where.append("seq > ?")
+            args.append(after_seq)
+        sql = "SELECT seq, version, data FROM orders"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq LIMIT ? OFFSET ?"
+        args += [-1 if limit is None else limit, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [(seq, ver, json.loads(data)) for seq, ver, data in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def version(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def get_upload(self, sha256: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM uploads WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def unit_owner(self, sku: str, product_id: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT order_id FROM units WHERE sku = ? AND product_id = ?",
+                (sku.upper(), product_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_units(self, product_id: str, sku: str | None = None) -> list[tuple[str, str, str]]:
+        sql = "SELECT sku, product_id, order_id FROM units WHERE product_id = ?"
+        args = [product_id]
+        if sku is not None:
+            sql += " AND sku = ?"
+            args.append(sku.upper())
+        with self._lock:
+            return [tuple(r) for r in self._conn.execute(sql + " ORDER BY sku", args).fetchall()]
+
+    # ---------- writes ----------
+
+    def record_upload(self, sha256: str, info: dict):
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO uploads (sha256, data) VALUES (?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET data = excluded.data",
+                (sha256, json.dumps(info, ensure_ascii=False)),
+            )
+
+    def clear(self):
+        with self.transaction():
+            self._conn.execute("DELETE FROM order_items")
+            self._conn.execute("DELETE FROM units")
+            self._conn.execute("DELETE FROM orders")
+            self._conn.execute("DELETE FROM uploads")
+
+    def put(self, order: dict) -> int:
+        order_id = order["order_id"]
+        data = json.dumps(order, ensure_ascii=False)
+        skus = {(it.get("sku") or "").upper() for it in order.get("items", [])}
+        with self.transaction():
+            self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            version = self.version()
+            self._conn.execute(
+                "INSERT INTO orders (order_id, status, data, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(order_id) DO UPDATE SET "
+                "status = excluded.status, data = excluded.data, version = excluded.version",
+                (order_id, order.get("status") or "pending", data, version),
+            )
+            self._conn.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
+            self._conn.executemany(
+                "INSERT INTO order_items (order_id, sku) VALUES (?, ?)",
+                [(order_id, s) for s in skus if s],
+            )
+            # Units already owned by another order keep that owner (callers check
+            # unit_owner() before adding a unit; this only matters for legacy data)
+            self._conn.execute("DELETE FROM units WHERE order_id = ?", (order_id,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO units (sku, product_id, order_id) VALUES (?, ?, ?)",
+                [(sku, pid, order_id) for sku, pid in _order_units(order)],
+            )
+        return version
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outer = self._depth == 0
+            if outer:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if outer:
+                    self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if outer:
+                    self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {
+    "sqlite": SQLiteOrderStore,
+}
+
+
+def open_store(path: str, backend: str = "sqlite") -> OrderStore:
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown order store backend: {backend!r}") from None
+    return cls(path)
@@ -0,0 +1,83 @@
+# textcache.py
+# -----------------------------------------------
+# Persistent page-text cache.
+#
+# Text extraction is the expensive half of parsing a manifest. Extracted
+# text is kept zlib-compressed in out/cache/pagetext.sqlite3, keyed by
+# (pdf sha256, page index, extraction settings), so re-parsing the same
+# file (reparse after a parser fix, a re-upload) only costs the regex
+# pass. Change the settings key whenever extraction output would change.
+# -----------------------------------------------
+
+import os
+import sqlite3
+import threading
+import zlib
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "out", "cache", "pagetext.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_text (
+    pdf_hash TEXT NOT NULL,
+    page     INTEGER NOT NULL,
+    settings TEXT NOT NULL,
+    text     BLOB NOT NULL,
+    PRIMARY KEY (pdf_hash, page, settings)
+) WITHOUT ROWID;
+"""
+
+
+class PageTextCache:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, pdf_hash: str, page: int, settings: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM page_text WHERE pdf_hash = ? AND page = ? AND settings = ?",
+                (pdf_hash, page, settings),
+            ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def get_range(self, pdf_hash: str, start: int, stop: int, settings: str) -> dict[int, str]:
+        """Cached pages in [start, stop) as {page: text}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page, text FROM page_text "
+                "WHERE pdf_hash = ? AND settings = ? AND page >= ? AND page < ?",
+                (pdf_hash, settings, start, stop),
+            ).fetchall()
+        return {page: zlib.decompress(blob).decode("utf-8") for page, blob in rows}
+
+    def put_many(self, pdf_hash: str, settings: str, texts: dict[int, str]):
+        if not texts:
+            return
+        rows = [(pdf_hash, page, settings, zlib.compress(text.encode("utf-8")))
+                for page, text in texts.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO page_text (pdf_hash, page, settings, text) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def put(self, pdf_hash: str, page: int, settings: str, text: str):
+        self.put_many(pdf_hash, settings, {page: text})
+
+
+_default: PageTextCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> PageTextCache:
+    """Cache at DEFAULT_PATH, opened once per process (parse workers included)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PageTextCache()
+        return _default
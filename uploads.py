@@ -0,0 +1,52 @@
+# uploads.py
+# -----------------------------------------------
+# Content-addressed storage for uploaded manifests.
+#
+# Every upload is kept as out/uploads/<sha256>.pdf, so a later upload can
+# never change the source PDF behind orders from an earlier batch, and an
+# identical re-upload maps to the same file (and can skip parsing).
+# -----------------------------------------------
+
+import hashlib
+import os
+import tempfile
+
+CHUNK_BYTES = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def upload_path(upload_dir: str, sha: str) -> str:
+    return os.path.join(upload_dir, f"{sha}.pdf")
+
+
+def save_content_addressed(stream, upload_dir: str) -> tuple[str, str]:
+    """Copy `stream` into upload_dir while hashing it. Returns (sha256, path).
+
+    The file is written to a temp name first and renamed into place, so a
+    half-written upload never shows up under a valid hash."""
+    os.makedirs(upload_dir, exist_ok=True)
+    h = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for block in iter(lambda: stream.read(CHUNK_BYTES), b""):
+                h.update(block)
+                out.write(block)
+        sha = h.hexdigest()
+        final_path = upload_path(upload_dir, sha)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        return sha, final_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise